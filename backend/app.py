@@ -1,14 +1,20 @@
-from flask import Flask, jsonify
+import click
+from flask import Flask, jsonify, request
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from config import Config
 from database import init_db, mongo
+from utils.cache import init_cache, response_cache
+from utils.quote_cache import init_quote_cache, quote_cache
 from routes.auth_routes import auth_bp, bcrypt
 from routes.expense_routes import expense_bp
 from routes.notification_routes import notification_bp
 from routes.finance_routes import finance_bp
-from routes.investment_routes import investment_bp
+from routes.investment_routes import investment_bp, STREAM_SCOPE
 from routes.emi_routes import emi_bp
+from routes.sync_routes import sync_bp
+from routes.export_routes import export_bp
+from routes.budget_routes import budget_bp
 
 # ✅ NEW imports for scheduler + timezone handling
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -26,7 +32,14 @@ def create_app():
     # --- Extensions ---
     jwt = JWTManager(app)
     bcrypt.init_app(app)
+
+    # ✅ stream tokens travel in URLs, so they open the price stream and nothing else
+    @jwt.token_verification_loader
+    def check_token_scope(jwt_header, jwt_data):
+        return jwt_data.get("scope") != STREAM_SCOPE or request.endpoint == "investment.price_stream"
     init_db(app)
+    init_cache(app)
+    init_quote_cache(app)
 
     # --- CORS ---
     CORS(app, resources={r"*": {"origins": [
@@ -41,12 +54,41 @@ def create_app():
     app.register_blueprint(finance_bp)
     app.register_blueprint(investment_bp)
     app.register_blueprint(emi_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(export_bp)
+    app.register_blueprint(budget_bp)
+
+    # --- CLI: `flask --app wsgi rebuild-rollups [--user <id>]` ---
+    @app.cli.command("rebuild-rollups")
+    @click.option("--user", "user_id", default=None, help="Only rebuild this user's buckets.")
+    def rebuild_rollups_command(user_id):
+        """Recompute expense_rollups from the expenses collection."""
+        from models.rollup_model import rebuild_rollups
+        n = rebuild_rollups(user_id)
+        print(f"✅ Rebuilt {n} rollup buckets")
+
+    # --- CLI: `flask --app wsgi migrate-expenses [--batch-size N]` (safe to re-run / resume) ---
+    @app.cli.command("migrate-expenses")
+    @click.option("--batch-size", default=1000, show_default=True)
+    def migrate_expenses_command(batch_size):
+        """Convert expenses to the compact v2 schema (ObjectId user refs, integer paise)."""
+        from models.expense_schema import migrate_expenses_v2
+        migrate_expenses_v2(batch_size)
 
     # --- Health check route ---
     @app.get("/health")
     def health():
         return jsonify({"status": "ok"})
 
+    # --- Response cache counters (per worker) ---
+    @app.get("/health/cache")
+    def cache_stats():
+        return jsonify(response_cache.stats())
+
+    @app.get("/health/quotes")
+    def quote_cache_stats():
+        return jsonify(quote_cache.stats())
+
     # -----------------------------------------------------
     # 🔔 Daily Email Scheduler for EMIs (9:00 AM IST)
     # -----------------------------------------------------
@@ -85,6 +127,21 @@ def create_app():
 
     # Schedule it daily at 9:00 AM IST
     scheduler.add_job(send_all_due_emails, "cron", hour=9, minute=0)
+
+    # 📈 Market data: keep `quotes` fresh for every watched / held symbol (first run right away)
+    from routes.investment_routes import poll_quotes
+    scheduler.add_job(poll_quotes, "interval", seconds=app.config["QUOTE_POLL_SECONDS"], args=[app],
+                      next_run_time=datetime.now(ist), max_instances=1, coalesce=True)
+
+    # 🔁 Recurring expenses: write occurrences as they fall due, so ETag revalidation sees them
+    from models.recurring_model import catch_up_due
+
+    def catch_up_recurring():
+        with app.app_context():
+            catch_up_due()
+
+    scheduler.add_job(catch_up_recurring, "interval", seconds=app.config["RECURRING_CATCH_UP_SECONDS"],
+                      max_instances=1, coalesce=True)
     scheduler.start()
 
     return app
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -10,4 +11,38 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=7)
 
     # CORS (adjust for your frontend origin)
-    CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*")
\ No newline at end of file
+    CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*")
+
+    # Response cache for aggregate endpoints: memory | redis | fake
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+    CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "300"))
+
+    # Exports: bigger than EXPORT_SYNC_MAX_ROWS must run as a background job
+    EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "expense-exports"))
+    EXPORT_SYNC_MAX_ROWS = int(os.getenv("EXPORT_SYNC_MAX_ROWS", "50000"))
+    EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+    EXPORT_TTL = int(os.getenv("EXPORT_TTL", str(24 * 3600)))  # seconds a finished file is kept
+    # Live quotes: seconds a fetched quote (or a failed lookup) is reused across requests
+    QUOTE_CACHE_TTL = int(os.getenv("QUOTE_CACHE_TTL", "15"))
+    QUOTE_MISS_TTL = int(os.getenv("QUOTE_MISS_TTL", "5"))
+    # Quote fetching: QUOTE_BATCH_SIZE symbols per upstream call on a QUOTE_POOL_SIZE pool.
+    # The poller refreshes every tracked symbol each QUOTE_POLL_SECONDS in NSE hours (slower after);
+    # /quote/<symbol> waits up to QUOTE_DEADLINE_MS for a symbol nobody tracks yet
+    QUOTE_POOL_SIZE = int(os.getenv("QUOTE_POOL_SIZE", "8"))
+    QUOTE_BATCH_SIZE = int(os.getenv("QUOTE_BATCH_SIZE", "10"))
+    QUOTE_DEADLINE_MS = int(os.getenv("QUOTE_DEADLINE_MS", "2500"))
+    QUOTE_POLL_SECONDS = int(os.getenv("QUOTE_POLL_SECONDS", "15"))
+    QUOTE_POLL_AFTER_HOURS_SECONDS = int(os.getenv("QUOTE_POLL_AFTER_HOURS_SECONDS", "900"))
+    # Price stream (SSE): per-worker connection cap, heartbeat, and how often the hub reads `quotes`
+    SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "24"))  # per worker; keep below gunicorn threads (gunicorn.conf.py)
+    SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    SSE_FEED_SECONDS = float(os.getenv("SSE_FEED_SECONDS", "1"))
+    SSE_TOKEN_SECONDS = int(os.getenv("SSE_TOKEN_SECONDS", "60"))  # lifetime of the ?jwt= stream token
+    SSE_MAX_STREAM_SECONDS = int(os.getenv("SSE_MAX_STREAM_SECONDS", "25"))  # then the client resumes on a new connection
+    # How often recurring occurrences that have fallen due are written (and versions bumped)
+    RECURRING_CATCH_UP_SECONDS = int(os.getenv("RECURRING_CATCH_UP_SECONDS", "60"))
+    # Idempotency-Key results for create endpoints
+    IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))  # seconds a stored response is replayable
+    IDEMPOTENCY_LEASE = int(os.getenv("IDEMPOTENCY_LEASE", "60"))  # seconds before an unfinished claim can be taken over
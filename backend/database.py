@@ -1,8 +1,11 @@
 from flask_pymongo import PyMongo
+from datetime import timedelta
 import sys
 
 mongo = PyMongo()
 
+TOMBSTONE_TTL = timedelta(days=30)
+
 def init_db(app):
     uri = app.config.get("MONGO_URI")
     print("📡 Trying to connect to MongoDB:", uri, file=sys.stdout)
@@ -27,15 +30,49 @@ def init_db(app):
             positions = db.positions
             emis = db.emis
             loans = db.loans
+            expense_rollups = db.expense_rollups
+            tombstones = db.tombstones
+            recurring_rules = db.recurring_rules
+            export_jobs = db.export_jobs
+            idempotency_keys = db.idempotency_keys
+            quotes = db.quotes
 
             # Indexes
             users.create_index("username", unique=True)
-            expenses.create_index([("user_id", 1), ("created_at", -1)])
+            # (user_id, created_at, _id) serves keyset pagination and, by prefix, every range read
+            expenses.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+            if "user_id_1_created_at_-1" in expenses.index_information():
+                expenses.drop_index("user_id_1_created_at_-1")  # superseded by the index above
+            expenses.create_index([("user_id", 1), ("note", "text")])  # per-user note search
+            expenses.create_index(
+                [("user_id", 1), ("import_hash", 1)],
+                unique=True,
+                partialFilterExpression={"import_hash": {"$exists": True}},
+            )  # statement import de-duplication
+            expenses.create_index(
+                [("recurring_id", 1), ("created_at", 1)],
+                unique=True,
+                partialFilterExpression={"recurring_id": {"$exists": True}},
+            )  # one expense per recurring occurrence
             finance.create_index([("user_id", 1), ("created_at", -1)])
             watchlists.create_index("user_id", unique=True)
             positions.create_index("user_id", unique=True)
             emis.create_index([("user_id", 1), ("due_date", 1)])
             loans.create_index([("user_id", 1), ("created_at", -1)])
+            expense_rollups.create_index([("user_id", 1), ("day", 1), ("category", 1)], unique=True)
+            recurring_rules.create_index([("user_id", 1), ("active", 1)])
+            recurring_rules.create_index([("active", 1), ("live_until", 1)])  # catch_up_due
+
+            # Delta sync: change feeds per collection + expiring tombstones for deletes
+            for coll in (expenses, emis, loans):
+                coll.create_index([("user_id", 1), ("updated_at", 1)])
+            tombstones.create_index([("user_id", 1), ("collection", 1), ("deleted_at", 1)])
+            tombstones.create_index("deleted_at", expireAfterSeconds=int(TOMBSTONE_TTL.total_seconds()))
+            export_jobs.create_index("created_at", expireAfterSeconds=app.config.get("EXPORT_TTL", 86400))
+            idempotency_keys.create_index("created_at", expireAfterSeconds=app.config.get("IDEMPOTENCY_TTL", 86400))
+            # tracked symbols are rewritten every poll; one-off lookups age out after a week
+            quotes.create_index("fetched_at", expireAfterSeconds=7 * 24 * 3600)
+            quotes.create_index("changed_at")
             print("✅ All MongoDB collections and indexes are ready!", file=sys.stdout)
         else:
             print("⚠️ mongo.db is None — collections not initialized", file=sys.stderr)
@@ -0,0 +1,17 @@
+# Gunicorn settings, read automatically when gunicorn is started from backend/:
+#   gunicorn "app:create_app()"
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+
+# ✅ threaded workers: a price stream (SSE) ties up one thread, not a whole worker,
+# and the arbiter's --timeout doesn't kill a worker for a long-lived response
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+# Streams per worker (see SSE_MAX_CONNECTIONS in config.py): at most three quarters of the
+# threads, so API requests always have some left. Across the deployment that caps streams
+# at workers * SSE_MAX_CONNECTIONS; extra clients get 503 and retry.
+os.environ.setdefault("SSE_MAX_CONNECTIONS", str(max(1, threads * 3 // 4)))
@@ -0,0 +1,175 @@
+from database import mongo
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import pytz
+from models.expense_schema import paise_of, to_paise
+from models.rollup_model import rollup_totals
+
+# Monthly spending goals per category, kept server-side:
+#   budget_goals:  {_id: user_id, goals: {category: paise}}
+#   budget_totals: {_id: "<user_id>:<YYYY-MM>", user_id, period, spent: {category: paise}, alerted: [category]}
+# The expense write paths call track_spend() so the current month's totals move with
+# every insert/edit/delete and a breach is noticed on the write that causes it.
+# `alerted` records which categories have already emailed this period.
+
+BUDGET_TZ = pytz.timezone("Asia/Kolkata")
+
+_mailer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="budget-mail")
+
+
+def period_of(dt: datetime):
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(BUDGET_TZ).strftime("%Y-%m")
+
+
+def _period_bounds(period: str):
+    """
+    [start, end] of a YYYY-MM month in BUDGET_TZ, as UTC datetimes.
+    """
+    y, m = map(int, period.split("-"))
+    start = BUDGET_TZ.localize(datetime(y, m, 1))
+    nxt = BUDGET_TZ.localize(datetime(y + m // 12, m % 12 + 1, 1))
+    return start.astimezone(timezone.utc), nxt.astimezone(timezone.utc) - timedelta(microseconds=1)
+
+
+def _totals_id(user_id: str, period: str):
+    return f"{user_id}:{period}"
+
+
+def get_goals(user_id: str):
+    doc = mongo.db.budget_goals.find_one({"_id": str(user_id)})
+    return (doc or {}).get("goals", {})
+
+
+def _period_spent(user_id: str, period: str):
+    start, end = _period_bounds(period)
+    return rollup_totals(user_id, start, end)
+
+
+def _seed_totals(user_id: str, period: str):
+    """
+    Create the period's totals from the rollups on the first tracked write of a month.
+    """
+    doc = {"_id": _totals_id(user_id, period), "user_id": str(user_id), "period": period,
+           "spent": _period_spent(user_id, period), "alerted": []}
+    mongo.db.budget_totals.insert_one(doc)
+    return doc
+
+
+def set_goals(user_id: str, goals: dict):
+    """
+    Replace the user's goals ({category: rupees}) and re-arm alerts for categories whose
+    goal changed. Returns the current period's state (and sends any alert now due).
+    """
+    user_id = str(user_id)
+    paise = {c: int(to_paise(v)) for c, v in goals.items()}
+    before = get_goals(user_id)
+    mongo.db.budget_goals.update_one({"_id": user_id}, {"$set": {"goals": paise}}, upsert=True)
+
+    # totals aren't kept while a user has no goals, so recount the month from the rollups
+    period = period_of(datetime.now(timezone.utc))
+    changed = [c for c in paise if before.get(c) != paise[c]]
+    totals = mongo.db.budget_totals.find_one_and_update(
+        {"_id": _totals_id(user_id, period)},
+        {"$set": {"user_id": user_id, "period": period, "spent": _period_spent(user_id, period)},
+         "$setOnInsert": {"alerted": []}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    if changed and set(changed) & set(totals["alerted"]):
+        totals = mongo.db.budget_totals.find_one_and_update(
+            {"_id": totals["_id"]},
+            {"$pull": {"alerted": {"$in": changed}}},
+            return_document=ReturnDocument.AFTER,
+        )
+    _check(user_id, totals, paise, paise.keys())
+    return goal_status(user_id)
+
+
+def goal_status(user_id: str):
+    period = period_of(datetime.now(timezone.utc))
+    goals = get_goals(user_id)
+    totals = mongo.db.budget_totals.find_one({"_id": _totals_id(user_id, period)}) or {}
+    spent = totals.get("spent", {})
+    return {
+        "period": period,
+        "goals": {c: p / 100 for c, p in goals.items()},
+        "spent": {c: spent.get(c, 0) / 100 for c in set(goals) | set(spent)},
+        "alerted": totals.get("alerted", []),
+    }
+
+
+def track_spend(user_id: str, docs: list, sign: int = 1):
+    """
+    Add (sign=1) or remove (sign=-1) expenses from the current month's totals.
+    """
+    track_edit(user_id, docs if sign < 0 else [], docs if sign > 0 else [])
+
+
+def track_edit(user_id: str, olds: list, news: list):
+    """
+    Move edited expenses (olds → news) in the current month's totals.
+    Does nothing for users without goals, and ignores other months.
+    One $inc per call, then a comparison against the goals already in hand.
+    """
+    if not (olds or news):
+        return
+    goals = get_goals(user_id)
+    if not goals:
+        return
+    period = period_of(datetime.now(timezone.utc))
+    deltas = {}
+    for docs, sign in ((olds, -1), (news, 1)):
+        for d in docs:
+            if period_of(d["created_at"]) == period:
+                deltas[d["category"]] = deltas.get(d["category"], 0) + sign * paise_of(d)
+    deltas = {c: v for c, v in deltas.items() if v}
+    if not deltas:
+        return
+
+    totals = mongo.db.budget_totals.find_one_and_update(
+        {"_id": _totals_id(user_id, period)},
+        {"$inc": {f"spent.{c}": v for c, v in deltas.items()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if totals is None:
+        # first write this month: seed from the rollups, which already include these docs
+        try:
+            totals = _seed_totals(user_id, period)
+        except DuplicateKeyError:
+            # another writer seeded first; its recount may or may not include ours, so don't add again
+            totals = mongo.db.budget_totals.find_one({"_id": _totals_id(user_id, period)})
+    _check(user_id, totals, goals, [c for c, v in deltas.items() if v > 0])
+
+
+def _check(user_id: str, totals: dict, goals: dict, categories):
+    for category in categories:
+        goal = goals.get(category)
+        spent = totals["spent"].get(category, 0)
+        if goal is None or spent <= goal or category in totals.get("alerted", []):
+            continue
+        # ✅ only the writer that flips `alerted` sends, however many tabs / workers race here
+        won = mongo.db.budget_totals.update_one(
+            {"_id": totals["_id"], "alerted": {"$ne": category}},
+            {"$addToSet": {"alerted": category}},
+        ).modified_count
+        if won:
+            _mailer.submit(_send_alert, user_id, category, spent / 100, goal / 100)
+
+
+def _send_alert(user_id: str, category: str, spent: float, goal: float):
+    from bson import ObjectId
+    from routes.notification_routes import send_goal_alert
+
+    user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"username": 1}) if ObjectId.is_valid(user_id) else None
+    email = (user or {}).get("username")
+    if not email:
+        return
+    try:
+        send_goal_alert(email, category, spent, goal)
+    except Exception as e:
+        print("⚠️ Goal alert email failed:", e)
+
@@ -0,0 +1,97 @@
+import time
+from database import mongo
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from utils.cache import MemoryBackend
+from utils.validation import ALLOWED_CATEGORIES
+
+# Custom categories per user: {_id: user_id, categories: [name, ...]}
+# Reads go through a per-process cache that writes in this process update directly;
+# other workers pick changes up on expiry, or immediately for a name they haven't
+# seen (a miss is re-checked against Mongo before a category is rejected).
+
+MAX_CUSTOM_CATEGORIES = 50
+MAX_NAME_LENGTH = 32
+CATEGORY_CACHE_TTL = 300
+MISS_RELOAD_INTERVAL = 2  # seconds; a burst of unknown names costs one reload, not one each
+
+_cache = MemoryBackend(max_entries=10000)
+
+
+def _store(user_id: str, names):
+    names = frozenset(names)
+    _cache.set(str(user_id), (names, time.monotonic()), CATEGORY_CACHE_TTL)
+    return names
+
+
+def _load(user_id: str):
+    doc = mongo.db.user_categories.find_one({"_id": str(user_id)}, {"categories": 1})
+    return _store(user_id, (doc or {}).get("categories", []))
+
+
+def custom_categories(user_id: str):
+    hit = _cache.get(str(user_id))
+    return hit[0] if hit is not None else _load(user_id)
+
+
+def is_user_category(user_id: str, name: str):
+    """
+    True if `name` is one of the user's custom categories. Cached; only a name the
+    cache doesn't know costs a round trip (it may have been added on another worker).
+    """
+    hit = _cache.get(str(user_id))
+    if hit is None:
+        return name in _load(user_id)
+    names, loaded_at = hit
+    if name in names:
+        return True
+    if time.monotonic() - loaded_at < MISS_RELOAD_INTERVAL:
+        return False
+    return name in _load(user_id)
+
+
+def all_categories(user_id: str = None):
+    merged = set(ALLOWED_CATEGORIES)
+    if user_id:
+        merged |= custom_categories(user_id)
+    return sorted(merged)
+
+
+def validate_new_name(name):
+    """
+    Normalise a proposed category name; raises ValueError if it can't be used.
+    """
+    name = (name or "").strip() if isinstance(name, str) else ""
+    if not name or len(name) > MAX_NAME_LENGTH:
+        raise ValueError(f"category name must be 1-{MAX_NAME_LENGTH} characters")
+    if "." in name or name.startswith("$"):
+        raise ValueError("category name can't contain '.' or start with '$'")
+    if name.lower() in {c.lower() for c in ALLOWED_CATEGORIES}:
+        raise ValueError("already a built-in category")
+    return name
+
+
+def add_category(user_id: str, name: str):
+    """
+    Returns the user's custom categories after adding `name`; raises ValueError at the limit.
+    """
+    try:
+        # the filter stops matching once the list is full, and the upsert then hits the existing _id
+        doc = mongo.db.user_categories.find_one_and_update(
+            {"_id": str(user_id), f"categories.{MAX_CUSTOM_CATEGORIES - 1}": {"$exists": False}},
+            {"$addToSet": {"categories": name}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        raise ValueError(f"at most {MAX_CUSTOM_CATEGORIES} custom categories")
+    return sorted(_store(user_id, doc["categories"]))  # ✅ write-through
+
+
+def remove_category(user_id: str, name: str):
+    """
+    Returns False if the user had no such category. Existing expenses keep it.
+    """
+    res = mongo.db.user_categories.update_one({"_id": str(user_id)}, {"$pull": {"categories": name}})
+    _load(user_id)  # ✅ write-through
+    return res.modified_count > 0
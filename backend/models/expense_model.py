@@ -1,119 +1,482 @@
 from database import mongo
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+from models.rollup_model import apply_rollup, replace_in_rollup, replace_many_in_rollup
+from models.sync_model import record_tombstone, record_tombstones
+from models.recurring_model import materialize_due
+from models.budget_model import track_spend, track_edit
+from models.expense_schema import (
+    PAISE, paise_of, rupees, to_paise, user_ref, user_match, amount_range, note_match
+)
 from typing import Union
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MS = timedelta(milliseconds=1)
 
-def add_expense(user_id: str, category: str, amount: float, note: Union[str, None] = None, date: Union[str, None] = None):
+
+def _parse_created_at(date: Union[str, datetime, None]):
     """
-    Add a new expense. Handles both with-date and without-date cases safely.
     Accepts date in formats like:
     - '2025-10-07' (from <input type="date">)
     - '2025-10-07T00:00:00Z' (ISO string)
+    - a datetime (e.g. from a parsed bank statement)
+    Falls back to now (UTC) when missing or unparseable.
     """
-
-    created_at = None
-    if date:
+    if not date:
+        return datetime.now(timezone.utc)
+    if isinstance(date, datetime):
+        return date
+    try:
+        # ✅ Try full ISO format (e.g., '2025-10-07T00:00:00Z')
+        return datetime.fromisoformat(date.replace("Z", "+00:00"))
+    except Exception:
         try:
-            # ✅ Try full ISO format (e.g., '2025-10-07T00:00:00Z')
-            created_at = datetime.fromisoformat(date.replace("Z", "+00:00"))
+            # ✅ Fallback for 'YYYY-MM-DD' (from date input)
+            return datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
         except Exception:
-            try:
-                # ✅ Fallback for 'YYYY-MM-DD' (from date input)
-                created_at = datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-            except Exception:
-                # ✅ Last resort
-                created_at = datetime.now(timezone.utc)
-    else:
-        created_at = datetime.now(timezone.utc)
+            # ✅ Last resort
+            return datetime.now(timezone.utc)
+
 
-    doc = {
-        "user_id": str(user_id),  # ✅ always store as string
+def build_expense_doc(user_id: str, category: str, amount: float, note: Union[str, None] = None,
+                      date: Union[str, datetime, None] = None):
+    """
+    Build the (schema v2) document stored for one expense, shared by every insert path.
+    """
+    return {
+        "user_id": user_ref(user_id),  # ✅ ObjectId ref (schema v2)
         "category": category,
-        "amount": float(amount),
+        "paise": to_paise(amount),  # ✅ integer minor units, exact sums
         "note": note or "",
-        "created_at": created_at,
+        "created_at": _parse_created_at(date),
+        "updated_at": datetime.now(timezone.utc),
     }
 
-    return mongo.db.expenses.insert_one(doc)
 
+def add_expense(user_id: str, category: str, amount: float, note: Union[str, None] = None, date: Union[str, None] = None):
+    """
+    Add a new expense. Handles both with-date and without-date cases safely.
+    """
+    doc = build_expense_doc(user_id, category, amount, note, date)
+    res = mongo.db.expenses.insert_one(doc)
+    apply_rollup([doc])
+    track_spend(user_id, [doc])  # ✅ budget goals: O(1) running total + breach check
+    return res
+
+
+def add_expenses_bulk(docs: list):
+    """
+    Insert many pre-built expense docs in one unordered round trip.
+    Returns {position_in_docs: error_message} for the rows the server rejected.
+    """
+    if not docs:
+        return {}
+    failed = {}
+    try:
+        mongo.db.expenses.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {err["index"]: err.get("errmsg", "write failed") for err in e.details.get("writeErrors", [])}
+    written = [d for i, d in enumerate(docs) if i not in failed]
+    apply_rollup(written)
+    if written:
+        track_spend(str(written[0]["user_id"]), written)  # callers insert one user's rows per batch
+    return failed
 
 
-def get_expenses(user_id: str, start: Union[datetime, None] = None, end: Union[datetime, None] = None):
+def import_expense_batch(user_id: str, docs: list):
     """
-    Fetch expenses for the given user, optionally filtered by date range.
+    Insert a batch of imported expenses, skipping ones whose import_hash already exists.
+    Existing hashes are looked up first (covered by the unique index), so re-importing
+    an overlapping statement costs one indexed query per batch and no writes.
+    Returns (inserted, duplicates).
+    """
+    if not docs:
+        return 0, 0
+    hashes = [d["import_hash"] for d in docs]
+    existing = {
+        x["import_hash"] for x in mongo.db.expenses.find(
+            {**user_match(user_id), "import_hash": {"$in": hashes}},
+            {"_id": 0, "import_hash": 1}
+        )
+    }
+    fresh = [d for d in docs if d["import_hash"] not in existing]
+    if not fresh:
+        return 0, len(docs)
+    failed = set()
+    try:
+        mongo.db.expenses.insert_many(fresh, ordered=False)
+    except BulkWriteError as e:
+        # ✅ a concurrent import may have won the race; the unique index keeps us honest
+        failed = {err["index"] for err in e.details.get("writeErrors", [])}
+    written = [d for i, d in enumerate(fresh) if i not in failed]
+    apply_rollup(written)
+    track_spend(user_id, written)
+    return len(written), len(docs) - len(written)
+
+
+def _range_match(user_id: str, start: Union[datetime, None] = None, end: Union[datetime, None] = None):
     """
-    query = {"user_id": str(user_id)}  # ✅ match by string
+    $match for the user's expenses in [start, end], after writing any recurring
+    occurrences that fall in that range.
+    """
+    materialize_due(user_id, start, end)  # ✅ recurring occurrences in range
+    match = user_match(user_id)  # ✅ v1 (str) and v2 (ObjectId) user refs
     if start or end:
-        query["created_at"] = {}
+        match["created_at"] = {}
         if start:
-            query["created_at"]["$gte"] = start
+            match["created_at"]["$gte"] = start
         if end:
-            query["created_at"]["$lte"] = end
+            match["created_at"]["$lte"] = end
+    return match
+
+
+def get_expenses(user_id: str, start: Union[datetime, None] = None, end: Union[datetime, None] = None,
+                 projection: Union[dict, None] = None):
+    """
+    Fetch expenses for the given user, optionally filtered by date range.
+    """
+    query = _range_match(user_id, start, end)
 
-    cursor = mongo.db.expenses.find(query).sort("created_at", -1)
+    cursor = mongo.db.expenses.find(query, projection).sort("created_at", -1)
     return list(cursor)
 
 
+def iter_expenses(user_id: str, start: Union[datetime, None] = None, end: Union[datetime, None] = None,
+                  batch_size: int = 500, projection: Union[dict, None] = None):
+    """
+    Same query as get_expenses but returns the live cursor instead of a list,
+    so callers can stream rows without holding the whole history in memory.
+    """
+    query = _range_match(user_id, start, end)
+
+    return mongo.db.expenses.find(query, projection).sort("created_at", -1).batch_size(batch_size)
+
+
+def get_expenses_page(user_id: str, limit: int, after: Union[tuple, None] = None,
+                      start: Union[datetime, None] = None, end: Union[datetime, None] = None,
+                      projection: Union[dict, None] = None):
+    """
+    Keyset-paginated variant of get_expenses, newest first.
+    `after` is the (created_at, _id) of the last row of the previous page.
+    Returns (rows, last_key) where last_key is None once the history is exhausted.
+    """
+    query = _range_match(user_id, start, end)
+
+    if after:
+        after_ts, after_id = after
+        query["$or"] = [
+            {"created_at": {"$lt": after_ts}},
+            {"created_at": after_ts, "_id": {"$lt": after_id}},
+        ]
+
+    # ✅ fetch one extra row to know whether another page exists
+    if projection:
+        projection = {**projection, "created_at": 1}  # ✅ needed for the next cursor
+    cursor = (mongo.db.expenses.find(query, projection)
+              .sort([("created_at", -1), ("_id", -1)])
+              .limit(limit + 1))
+    rows = list(cursor)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1]["created_at"], rows[-1]["_id"])
+
+
+def expense_columns(user_id: str, start: Union[datetime, None] = None, end: Union[datetime, None] = None,
+                    batch_size: int = 5000):
+    """
+    Same rows as get_expenses, but grouped by category into parallel arrays,
+    oldest first: {category: {"ids": [...], "paise": [...], "ts": [epoch ms, ...]}}.
+    Plain int lists load straight into NumPy. Built from a batched cursor rather than a
+    $group/$push, whose one document per category would hit the 16MB BSON limit on long histories.
+    """
+    query = _range_match(user_id, start, end)
+
+    columns = {}
+    cursor = (mongo.db.expenses.find(query, {"category": 1, "paise": 1, "amount": 1, "created_at": 1})
+              .sort("created_at", 1)
+              .batch_size(batch_size))
+    for doc in cursor:
+        col = columns.get(doc["category"])
+        if col is None:
+            col = columns[doc["category"]] = {"_id": doc["category"], "ids": [], "paise": [], "ts": []}
+        created_at = doc["created_at"]
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        col["ids"].append(doc["_id"])
+        col["paise"].append(paise_of(doc))
+        col["ts"].append((created_at - EPOCH) // MS)  # ✅ integer epoch ms, no float rounding
+    return columns
+
+
 def delete_expense(user_id: str, expense_id: str):
     """
     Delete a specific expense by its ID for a user.
+    Returns the deleted document, or None if nothing matched.
     """
-    return mongo.db.expenses.delete_one({
+    doc = mongo.db.expenses.find_one_and_delete({
         "_id": ObjectId(expense_id),
-        "user_id": str(user_id)  # ✅ ensure consistent type
+        **user_match(user_id)
     })
+    if doc:
+        apply_rollup([doc], -1)
+        track_spend(user_id, [doc], -1)
+        record_tombstone(user_id, "expenses", doc["_id"])
+    return doc
 
 
 def update_expense(user_id: str, expense_id: str, updates: dict):
     """
     Update fields (category, amount, note) for an expense.
+    Returns the updated document, or None if nothing matched.
     """
     updates = {k: v for k, v in updates.items() if v is not None}
-    return mongo.db.expenses.update_one(
-        {"_id": ObjectId(expense_id), "user_id": str(user_id)},  # ✅ consistent user_id type
-        {"$set": updates}
+    change = {"$set": updates}
+    if "amount" in updates:
+        updates["paise"] = to_paise(updates.pop("amount"))
+        change["$unset"] = {"amount": ""}  # ✅ an edited v1 doc moves to v2 amounts
+    updates["updated_at"] = datetime.now(timezone.utc)
+    old = mongo.db.expenses.find_one_and_update(
+        {"_id": ObjectId(expense_id), **user_match(user_id)},
+        change,
+        return_document=ReturnDocument.BEFORE
     )
+    if not old:
+        return None
+    new = {**old, **updates}
+    if "paise" in updates:
+        new.pop("amount", None)
+    if any(k in updates for k in ("category", "paise", "created_at")):
+        replace_in_rollup(old, new)
+        track_edit(user_id, [old], [new])
+    return new
 
 
-def agg_summary_by_category(user_id: str, start=None, end=None):
+def _unchanged(doc: dict):
     """
-    Aggregate total spending by category for the user.
+    Filter matching `doc` only while the fields the rollups depend on are as read,
+    so a batch write never applies on top of a concurrent edit it didn't see.
     """
-    match = {"user_id": str(user_id)}
-    if start or end:
-        match["created_at"] = {}
-        if start:
-            match["created_at"]["$gte"] = start
-        if end:
-            match["created_at"]["$lte"] = end
+    guard = {"category": doc["category"], "created_at": doc["created_at"]}
+    if doc.get("paise") is not None:
+        guard["paise"] = doc["paise"]
+    else:
+        guard["amount"] = doc["amount"]
+        guard["paise"] = {"$exists": False}
+    return guard
+
+
+def _bulk_apply(olds: dict, ops: list):
+    """
+    Run ops (one per doc in `olds`, same order) as one unordered bulk_write.
+    Returns (ids, {id: error}, number of docs matched or removed).
+    """
+    ids = list(olds)
+    errors = {}
+    try:
+        res = mongo.db.expenses.bulk_write(ops, ordered=False)
+        done = res.matched_count + res.deleted_count
+    except BulkWriteError as e:
+        errors = {ids[err["index"]]: err.get("errmsg", "write failed") for err in e.details.get("writeErrors", [])}
+        done = e.details.get("nMatched", 0) + e.details.get("nRemoved", 0)
+    return ids, errors, done
+
+
+def update_expenses_bulk(user_id: str, changes: dict):
+    """
+    Apply {ObjectId: {category?, amount?, note?}} to the user's expenses in one
+    unordered bulk_write. Returns {ObjectId: "updated" | "not_found" | "conflict" | error}.
+    """
+    olds = {d["_id"]: d for d in mongo.db.expenses.find({"_id": {"$in": list(changes)}, **user_match(user_id)})}
+    results = {oid: "not_found" for oid in changes if oid not in olds}
+    if not olds:
+        return results
+
+    stamp = datetime.now(timezone.utc)
+    ops, news = [], {}
+    for oid, old in olds.items():
+        updates = {k: v for k, v in changes[oid].items() if v is not None}
+        change = {"$set": updates}
+        if "amount" in updates:
+            updates["paise"] = to_paise(updates.pop("amount"))
+            change["$unset"] = {"amount": ""}
+        updates["updated_at"] = stamp
+        ops.append(UpdateOne({"_id": oid, **user_match(user_id), **_unchanged(old)}, change))
+        new = {**old, **updates}
+        if "paise" in updates:
+            new.pop("amount", None)
+        news[oid] = new
+
+    ids, errors, done = _bulk_apply(olds, ops)
+    applied = [oid for oid in ids if oid not in errors]
+    if done < len(applied):
+        # ✅ some filters stopped matching (edited or deleted meanwhile); the batch stamp tells which landed
+        landed = {x["_id"] for x in mongo.db.expenses.find({"_id": {"$in": applied}, "updated_at": stamp}, {"_id": 1})}
+        applied = [oid for oid in applied if oid in landed]
+
+    replace_many_in_rollup([olds[oid] for oid in applied], [news[oid] for oid in applied])
+    track_edit(user_id, [olds[oid] for oid in applied], [news[oid] for oid in applied])
+    results.update({oid: "conflict" for oid in ids})
+    results.update(errors)
+    results.update({oid: "updated" for oid in applied})
+    return results
+
+
+def delete_expenses_bulk(user_id: str, ids: list):
+    """
+    Delete the user's expenses with these ObjectIds in one unordered bulk_write.
+    Returns {ObjectId: "deleted" | "not_found" | "conflict" | error}.
+    """
+    olds = {d["_id"]: d for d in mongo.db.expenses.find({"_id": {"$in": list(ids)}, **user_match(user_id)})}
+    results = {oid: "not_found" for oid in ids if oid not in olds}
+    if not olds:
+        return results
+
+    ops = [DeleteOne({"_id": oid, **user_match(user_id), **_unchanged(old)}) for oid, old in olds.items()]
+    ids, errors, done = _bulk_apply(olds, ops)
+    removed = [oid for oid in ids if oid not in errors]
+    if done < len(removed):
+        # ✅ rows still present were edited meanwhile and kept; a row another request
+        # deleted in the same instant can't be told apart from ours (rebuild-rollups repairs that)
+        survivors = {x["_id"] for x in mongo.db.expenses.find({"_id": {"$in": removed}}, {"_id": 1})}
+        removed = [oid for oid in removed if oid not in survivors]
+
+    apply_rollup([olds[oid] for oid in removed], -1)
+    track_spend(user_id, [olds[oid] for oid in removed], -1)
+    record_tombstones(user_id, "expenses", removed)
+    results.update({oid: "conflict" for oid in ids})
+    results.update(errors)
+    results.update({oid: "deleted" for oid in removed})
+    return results
+
+
+SERIES_PERIODS = {"day", "week", "month", "quarter", "year"}
+
+
+def _period_label(period: str, tz: str):
+    """
+    Label for a $dateTrunc bucket start, rendered in the caller's timezone.
+    """
+    if period == "quarter":
+        return {"$concat": [
+            {"$dateToString": {"format": "%Y", "date": "$_id", "timezone": tz}},
+            "-Q",
+            {"$toString": {"$toInt": {"$ceil": {"$divide": [{"$month": {"date": "$_id", "timezone": tz}}, 3]}}}},
+        ]}
+    fmt = {"day": "%Y-%m-%d", "week": "%G-W%V", "month": "%Y-%m", "year": "%Y"}[period]
+    return {"$dateToString": {"format": fmt, "date": "$_id", "timezone": tz}}
+
+
+def agg_spend_over_time(user_id: str, period: str = "month", start=None, end=None, tz: str = "UTC"):
+    """
+    Aggregate total spending over time (by day, week, month, quarter or year).
+    Buckets are cut in `tz` (an Olson name like 'Asia/Kolkata'); the optional
+    start/end bound the $match on the (user_id, created_at) index.
+    """
+    if period not in SERIES_PERIODS:
+        period = "month"
+
+    match = _range_match(user_id, start, end)
+
+    bucket = {"date": "$created_at", "unit": period, "timezone": tz}
+    if period == "week":
+        bucket["startOfWeek"] = "monday"  # ✅ ISO weeks, matches the %G-W%V label
 
     pipeline = [
         {"$match": match},
-        {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
-        {"$project": {"_id": 0, "category": "$_id", "total": 1}},
-        {"$sort": {"total": -1}}
+        {"$group": {"_id": {"$dateTrunc": bucket}, "total": {"$sum": PAISE}}},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "period": _period_label(period, tz), "start": "$_id", "total": rupees("$total")}},
     ]
     return list(mongo.db.expenses.aggregate(pipeline))
 
 
-def agg_spend_over_time(user_id: str, period: str = "month"):
+def agg_dashboard(user_id: str, start=None, end=None, tz: str = "UTC", top_n: int = 5):
     """
-    Aggregate total spending over time (by day, week, or month).
+    Everything the dashboard charts need in one $facet pass:
+    daily, monthly and per-category totals, top categories, largest expenses and overall totals.
     """
-    if period not in {"day", "week", "month"}:
-        period = "month"
+    match = _range_match(user_id, start, end)
 
-    date_fmt = {
-        "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
-        "week": {"$dateToString": {"format": "%G-W%V", "date": "$created_at"}},
-        "month": {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}},
-    }[period]
+    day = {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at", "timezone": tz}}
+    month = {"$dateToString": {"format": "%Y-%m", "date": "$created_at", "timezone": tz}}
 
     pipeline = [
-        {"$match": {"user_id": str(user_id)}},  # ✅ consistent
-        {"$group": {"_id": date_fmt, "total": {"$sum": "$amount"}}},
-        {"$project": {"_id": 0, "period": "$_id", "total": 1}},
-        {"$sort": {"period": 1}}
+        {"$match": match},
+        {"$facet": {
+            "daily": [
+                {"$group": {"_id": day, "total": {"$sum": PAISE}}},
+                {"$sort": {"_id": 1}},
+                {"$project": {"_id": 0, "day": "$_id", "total": rupees("$total")}},
+            ],
+            "monthly": [
+                {"$group": {"_id": month, "total": {"$sum": PAISE}}},
+                {"$sort": {"_id": 1}},
+                {"$project": {"_id": 0, "month": "$_id", "total": rupees("$total")}},
+            ],
+            "by_category": [
+                {"$group": {"_id": "$category", "total": {"$sum": PAISE}, "count": {"$sum": 1}}},
+                {"$sort": {"total": -1}},
+                {"$project": {"_id": 0, "category": "$_id", "total": rupees("$total"), "count": 1}},
+            ],
+            "top_expenses": [
+                {"$addFields": {"_paise": PAISE}},
+                {"$sort": {"_paise": -1}},
+                {"$limit": top_n},
+                {"$project": {"_id": 0, "id": {"$toString": "$_id"}, "category": 1,
+                              "amount": rupees("$_paise"), "note": 1, "created_at": 1}},
+            ],
+            "totals": [
+                {"$group": {"_id": None, "total": {"$sum": PAISE}, "count": {"$sum": 1},
+                            "days": {"$addToSet": day}}},
+                {"$project": {"_id": 0, "total": rupees("$total"), "count": 1, "active_days": {"$size": "$days"}}},
+            ],
+        }},
     ]
-    return list(mongo.db.expenses.aggregate(pipeline))
+    return next(mongo.db.expenses.aggregate(pipeline))
+
+
+AMOUNT_FACET_BOUNDARIES = [0, 100, 500, 1000, 5000, 10000]
+
+
+def search_expenses(user_id: str, q: Union[str, None] = None, categories: Union[list, None] = None,
+                    min_amount=None, max_amount=None, start=None, end=None, limit: int = 50, skip: int = 0):
+    """
+    Text search over notes with category / amount / date filters and facet counts in one round trip.
+    Category counts ignore the category filter itself, so the UI can show every option.
+    """
+    match = _range_match(user_id, start, end)
+    scored = False
+    if q:
+        text, scored = note_match(q)
+        match.update(text)
+
+    selected = [{"$match": {"category": {"$in": categories}}}] if categories else []
+    order = {"score": -1, "created_at": -1} if scored else {"created_at": -1}
+
+    pipeline = [{"$match": match}]
+    amounts = amount_range(min_amount, max_amount)
+    if amounts:
+        pipeline.append(amounts)
+    if scored:
+        pipeline.append({"$addFields": {"score": {"$meta": "textScore"}}})
+    pipeline.append({"$facet": {
+        "items": selected + [{"$sort": order}, {"$skip": skip}, {"$limit": limit}],
+        "total": selected + [{"$count": "n"}],
+        "categories": [
+            {"$group": {"_id": "$category", "count": {"$sum": 1}, "total": {"$sum": PAISE}}},
+            {"$sort": {"count": -1}},
+            {"$project": {"_id": 0, "category": "$_id", "count": 1, "total": rupees("$total")}},
+        ],
+        "amounts": selected + [
+            {"$bucket": {
+                "groupBy": rupees(PAISE),
+                "boundaries": AMOUNT_FACET_BOUNDARIES,
+                "default": "above",
+                "output": {"count": {"$sum": 1}},
+            }},
+        ],
+    }})
+    return next(mongo.db.expenses.aggregate(pipeline))
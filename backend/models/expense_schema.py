@@ -0,0 +1,176 @@
+from database import mongo
+from bson import ObjectId, Int64
+from pymongo import UpdateOne
+import re
+import time
+
+# Expense documents come in two shapes:
+#   v1: {user_id: "<24-hex str>", amount: <float rupees>, ...}
+#   v2: {user_id: ObjectId(...),  paise:  <int64>,        ...}
+# New writes are v2; migrate_expenses_v2() converts v1 docs in place. Until the
+# migration has finished, reads match both user_id types and take whichever
+# amount field a document has.
+
+MIGRATION_ID = "expenses_v2"
+_MIGRATION_CHECK_EVERY = 60  # seconds between re-reading the migration marker
+
+_migration_state = {"done": False, "checked_at": 0.0}
+
+
+def to_paise(amount) -> Int64:
+    return Int64(round(float(amount) * 100))
+
+
+def _paise_or_none(amount):
+    try:
+        return to_paise(amount)
+    except (TypeError, ValueError, OverflowError):  # null, non-numeric, NaN/inf
+        return None
+
+
+def paise_of(doc: dict) -> int:
+    if doc.get("paise") is not None:
+        return int(doc["paise"])
+    return int(round(float(doc.get("amount", 0)) * 100))
+
+
+def amount_of(doc: dict) -> float:
+    """
+    Rupee amount of a stored expense, whichever schema version it is in.
+    """
+    if doc.get("paise") is not None:
+        return int(doc["paise"]) / 100
+    return float(doc["amount"])
+
+
+def user_ref(user_id):
+    uid = str(user_id)
+    return ObjectId(uid) if ObjectId.is_valid(uid) else uid
+
+
+def migration_done() -> bool:
+    """
+    True once every expense is v2. Cached per process; once true it stays true.
+    """
+    state = _migration_state
+    if state["done"]:
+        return True
+    now = time.monotonic()
+    if now - state["checked_at"] >= _MIGRATION_CHECK_EVERY:
+        state["checked_at"] = now
+        doc = mongo.db.migrations.find_one({"_id": MIGRATION_ID}, {"done": 1})
+        state["done"] = bool(doc and doc.get("done"))
+    return state["done"]
+
+
+def user_match(user_id) -> dict:
+    """
+    Filter on the owning user that works for both v1 and v2 documents.
+    """
+    ref = user_ref(user_id)
+    if not isinstance(ref, ObjectId) or migration_done():
+        return {"user_id": ref}
+    return {"user_id": {"$in": [ref, str(user_id)]}}
+
+
+# Integer paise for either version, for use inside aggregation pipelines
+PAISE = {"$ifNull": ["$paise", {"$toLong": {"$round": [{"$multiply": ["$amount", 100]}, 0]}}]}
+
+
+def rupees(expr):
+    return {"$divide": [expr, 100]}
+
+
+def amount_range(min_amount=None, max_amount=None):
+    """
+    $match stage for a rupee range, or None when unbounded.
+    """
+    conds = []
+    if min_amount is not None:
+        conds.append({"$gte": [PAISE, round(min_amount * 100)]})
+    if max_amount is not None:
+        conds.append({"$lte": [PAISE, round(max_amount * 100)]})
+    return {"$match": {"$expr": {"$and": conds}}} if conds else None
+
+
+def note_match(q: str):
+    """
+    Filter on note text. The (user_id, note) text index needs an equality match on
+    user_id, which the mixed-version filter can't give, so until the migration
+    finishes this falls back to a case-insensitive match on every word.
+    Returns (filter, uses_text_index).
+    """
+    if migration_done():
+        return {"$text": {"$search": q}}, True
+    words = [re.escape(w) for w in q.split()]
+    return {"$and": [{"note": {"$regex": w, "$options": "i"}} for w in words]}, False
+
+
+def migrate_expenses_v2(batch_size: int = 1000, log=print):
+    """
+    Convert v1 expenses to v2 in _id order, checkpointing after every batch so an
+    interrupted run resumes where it stopped. Each update is conditional on the
+    values it read, so concurrent edits are never overwritten; anything skipped that
+    way is picked up by the final sweep, which repeats until no v1 docs remain.
+    A doc whose amount can't be read as rupees keeps it, is flagged
+    `amount_invalid` (so it doesn't hold up the sweep) and counted as skipped.
+    """
+    coll = mongo.db.expenses
+    progress = mongo.db.migrations
+    legacy = {"$or": [{"amount": {"$exists": True}, "paise": {"$exists": False}, "amount_invalid": {"$exists": False}},
+                      {"user_id": {"$type": "string", "$regex": "^[0-9a-f]{24}$"}}]}
+
+    while True:
+        state = progress.find_one({"_id": MIGRATION_ID}) or {}
+        last_id = state.get("last_id")
+        query = dict(legacy)
+        if last_id is not None:
+            query = {"$and": [legacy, {"_id": {"$gt": last_id}}]}
+
+        batch = list(coll.find(query, {"user_id": 1, "amount": 1, "paise": 1}).sort("_id", 1).limit(batch_size))
+        if not batch:
+            remaining = coll.count_documents(legacy)
+            if remaining == 0:
+                progress.update_one({"_id": MIGRATION_ID}, {"$set": {"done": True}}, upsert=True)
+                log("✅ expenses migrated to schema v2")
+                if state.get("skipped"):
+                    log(f"⚠️ skipped {state['skipped']} expenses with a null or non-numeric amount "
+                        "(left as-is, flagged amount_invalid)")
+                return state.get("converted", 0)
+            # rows edited mid-run were skipped; sweep again from the start
+            progress.update_one({"_id": MIGRATION_ID}, {"$set": {"last_id": None}}, upsert=True)
+            continue
+
+        ops, flagged = [], []
+        for doc in batch:
+            filt, set_, unset = {"_id": doc["_id"]}, {}, {}
+            if isinstance(doc.get("user_id"), str) and ObjectId.is_valid(doc["user_id"]):
+                filt["user_id"] = doc["user_id"]
+                set_["user_id"] = ObjectId(doc["user_id"])
+            if "amount" in doc and doc.get("paise") is None:
+                filt["amount"] = doc["amount"]
+                paise = _paise_or_none(doc["amount"])
+                if paise is None:
+                    set_["amount_invalid"] = True
+                else:
+                    set_["paise"] = paise
+                    unset["amount"] = ""
+            if set_:
+                update = {"$set": set_}
+                if unset:
+                    update["$unset"] = unset
+                (flagged if set_.get("amount_invalid") else ops).append(UpdateOne(filt, update))
+
+        res = coll.bulk_write(ops, ordered=False) if ops else None
+        converted = res.modified_count if res else 0
+        res = coll.bulk_write(flagged, ordered=False) if flagged else None
+        skipped = res.modified_count if res else 0
+        if skipped:
+            log(f"… skipped {skipped} expenses with an unusable amount")
+        progress.update_one(
+            {"_id": MIGRATION_ID},
+            {"$set": {"last_id": batch[-1]["_id"], "done": False},
+             "$inc": {"converted": converted, "skipped": skipped}},
+            upsert=True,
+        )
+        log(f"… converted {converted} expenses up to {batch[-1]['_id']}")
@@ -0,0 +1,139 @@
+from database import mongo
+from datetime import datetime, time, timedelta, timezone
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+import pytz
+
+# Latest quote per symbol, written by the background poller (routes/investment_routes.poll_quotes):
+#   quotes: {_id: requested symbol, symbol, price, change, status, fetched_at, changed_at, fetch_ms}
+#           (changed_at only moves when price/change do; it is the event id of the price stream)
+#   locks:  {_id: "quote_poller", owner, until}, so one worker polls per interval
+# Investment endpoints read from `quotes` instead of calling NSE/Yahoo per request.
+
+MARKET_TZ = pytz.timezone("Asia/Kolkata")
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 30)
+POLL_LOCK = "quote_poller"
+
+
+def market_open(now: datetime = None):
+    """
+    NSE cash-market hours, Mon–Fri 09:15–15:30 IST (exchange holidays aren't modelled).
+    """
+    now = (now or datetime.now(timezone.utc)).astimezone(MARKET_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() <= MARKET_CLOSE
+
+
+def tracked_symbols():
+    """
+    Distinct symbols across every user's watchlist and positions.
+    """
+    out = set()
+    for coll in ("watchlists", "positions"):
+        out.update(s for s in mongo.db[coll].distinct("items.symbol") if s)
+    return sorted(out)
+
+
+def _aware(dt: datetime):
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def save_quotes(quotes: dict, fetch_ms: float = None, fetched_at=None):
+    """
+    Upsert {requested symbol: quote}; failed lookups (None) leave the previous quote in place.
+    `fetched_at` is when the quotes came from upstream (default now), one datetime or
+    {symbol: datetime} for quotes served from the in-memory cache. A quote no newer than
+    the stored one is skipped, so a cache hit never makes an old price look fresh.
+    """
+    now = datetime.now(timezone.utc)
+    prev = read_quotes([s for s, q in quotes.items() if q])
+    ops = []
+    for symbol, q in quotes.items():
+        if not q:
+            continue
+        at = (fetched_at.get(symbol) if isinstance(fetched_at, dict) else fetched_at) or now
+        old = prev.get(symbol)
+        if old and _aware(old["fetched_at"]) >= at:
+            continue
+        fields = {**q, "fetched_at": at, "fetch_ms": fetch_ms}
+        if not old or (old.get("price"), old.get("change")) != (q.get("price"), q.get("change")):
+            fields["changed_at"] = at
+        ops.append(UpdateOne({"_id": symbol}, {"$set": fields}, upsert=True))
+    if ops:
+        mongo.db.quotes.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def read_quotes(symbols):
+    """
+    {symbol: quote doc} for the symbols that have one, in a single _id lookup.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    return {d["_id"]: d for d in mongo.db.quotes.find({"_id": {"$in": symbols}})}
+
+
+def event_id(doc: dict):
+    """
+    Stream event id of a quote doc: its changed_at in epoch ms (fetched_at for quotes
+    stored before changed_at was kept).
+    """
+    return int(_aware(doc.get("changed_at") or doc["fetched_at"]).timestamp() * 1000)
+
+
+def quote_payload(doc: dict):
+    """
+    {symbol, price, change, status} of a quote doc, keyed by the symbol the user tracks
+    (the doc _id) even when the price came from the .BO listing, which is then in `listing`.
+    Shared by the quote endpoints and the price stream so clients match both to the same row.
+    """
+    out = {"symbol": doc["_id"], **{k: doc.get(k) for k in ("price", "change", "status")}}
+    if doc.get("symbol") not in (None, doc["_id"]):
+        out["listing"] = doc["symbol"]
+    return out
+
+
+def _event(doc: dict):
+    return event_id(doc), doc["_id"], quote_payload(doc)
+
+
+def _ms_to_dt(ms: int):
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
+
+
+def quote_changes(since_ms: int):
+    """
+    Price events [(id, symbol, payload)] for every quote that changed after `since_ms`, oldest first.
+    """
+    docs = mongo.db.quotes.find({"changed_at": {"$gt": _ms_to_dt(since_ms)}}).sort("changed_at", 1)
+    return [_event(d) for d in docs]
+
+
+def quote_events(symbols, since_ms: int = None):
+    """
+    Current price events for `symbols`, or only those that changed after `since_ms`
+    (a client resuming from Last-Event-ID, which it has already seen). Oldest first.
+    """
+    query = {"_id": {"$in": list(dict.fromkeys(symbols))}}
+    if since_ms is not None:
+        query["changed_at"] = {"$gt": _ms_to_dt(since_ms)}
+    return sorted((_event(d) for d in mongo.db.quotes.find(query)), key=lambda e: e[0])
+
+
+def claim_poll(owner: str, seconds: float):
+    """
+    Take the poller lease for `seconds` if nobody holds it. The lease doubles as the
+    cadence: a worker can't poll again until it runs out.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        mongo.db.locks.update_one(
+            {"_id": POLL_LOCK, "until": {"$lt": now}},
+            {"$set": {"owner": owner, "until": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # the lock exists and hasn't expired, so the upsert tried to insert a second one
+        return False
@@ -0,0 +1,254 @@
+from database import mongo
+from datetime import datetime, timedelta, timezone
+from calendar import monthrange
+from bson import ObjectId
+from typing import Union
+from models.expense_schema import to_paise
+from models.version_model import bump_version
+
+# Recurring rules live in `recurring_rules`:
+#   {user_id, category, paise, note, freq, interval, start, until, active, spans, live_until}
+# Occurrences are written to `expenses` (tagged with recurring_id) only when a read
+# covers them. `spans` is the sorted list of disjoint [lo, hi) intervals a rule has
+# already been expanded over, so each occurrence is written once and a read only
+# writes the parts of its own range that no earlier read has reached. `live_until`
+# is where the last open-ended ("up to now") read stopped; catch_up() carries it forward.
+# Both are stored widened to the neighbouring occurrences (see _snap), so once every
+# due occurrence is written, further reads leave the rule untouched.
+
+FREQUENCIES = {"daily", "weekly", "monthly", "yearly"}
+MS = timedelta(milliseconds=1)  # Mongo's datetime resolution
+
+
+def _utc(dt: datetime):
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def _add_months(dt: datetime, months: int):
+    y, m = divmod(dt.month - 1 + months, 12)
+    y += dt.year
+    m += 1
+    day = min(dt.day, monthrange(y, m)[1])  # ✅ 31st → last day of shorter months
+    return dt.replace(year=y, month=m, day=day)
+
+
+def _nth(rule: dict, n: int):
+    start, step = _utc(rule["start"]), n * rule.get("interval", 1)
+    freq = rule["freq"]
+    if freq == "daily":
+        return start + timedelta(days=step)
+    if freq == "weekly":
+        return start + timedelta(weeks=step)
+    if freq == "monthly":
+        return _add_months(start, step)
+    return _add_months(start, 12 * step)
+
+
+def _first_index_from(rule: dict, lo: datetime):
+    """
+    Smallest n whose occurrence is at or after `lo`, found arithmetically rather
+    than by walking from the rule's start.
+    """
+    start = _utc(rule["start"])
+    if lo <= start:
+        return 0
+    interval = rule.get("interval", 1)
+    freq = rule["freq"]
+    if freq in ("daily", "weekly"):
+        unit = 1 if freq == "daily" else 7
+        n = (lo - start).days // (unit * interval)
+    else:
+        months = (lo.year - start.year) * 12 + (lo.month - start.month)
+        n = months // (interval * (12 if freq == "yearly" else 1))
+    n = max(n - 1, 0)
+    while _nth(rule, n) < lo:
+        n += 1
+    return n
+
+
+def occurrences(rule: dict, lo: datetime, hi: datetime):
+    """
+    Occurrence datetimes in [lo, hi), honouring the rule's `until` (inclusive).
+    """
+    lo, hi = _utc(lo), _utc(hi)
+    until = _utc(rule["until"]) if rule.get("until") is not None else None
+    out = []
+    n = _first_index_from(rule, lo)
+    while True:
+        at = _nth(rule, n)
+        if at >= hi or (until is not None and at > until):
+            return out
+        out.append(at)
+        n += 1
+
+
+def create_rule(user_id: str, category: str, amount: float, note: str, freq: str, interval: int,
+                start: datetime, until: Union[datetime, None] = None):
+    doc = {
+        "user_id": str(user_id),
+        "category": category,
+        "paise": to_paise(amount),
+        "note": note or "",
+        "freq": freq,
+        "interval": interval,
+        "start": _utc(start),
+        "until": _utc(until) if until else None,
+        "active": True,
+        "spans": [],
+        "live_until": None,
+        "created_at": datetime.now(timezone.utc),
+    }
+    doc["_id"] = mongo.db.recurring_rules.insert_one(doc).inserted_id
+    return doc
+
+
+def list_rules(user_id: str):
+    return list(mongo.db.recurring_rules.find({"user_id": str(user_id), "active": True}).sort("created_at", -1))
+
+
+def _spans(rule: dict):
+    return [(_utc(a), _utc(b)) for a, b in rule.get("spans", [])]
+
+
+def _live_until(rule: dict):
+    return _utc(rule["live_until"]) if rule.get("live_until") is not None else None
+
+
+def _snap(rule: dict, lo: datetime, hi: datetime):
+    """
+    Widen [lo, hi) to just after the previous occurrence and up to the next one (or past
+    `until`). Same occurrences, but the bounds only move when an occurrence date is
+    crossed, so reads that just advance "now" have nothing new to record.
+    """
+    n = _first_index_from(rule, lo)
+    lo = _nth(rule, n - 1) + MS if n else _utc(rule["start"])
+    nxt = _nth(rule, _first_index_from(rule, hi))
+    if rule.get("until") is not None and nxt > _utc(rule["until"]):
+        nxt = _utc(rule["until"]) + MS
+    return lo, nxt
+
+
+def _missing(spans: list, lo: datetime, hi: datetime):
+    """
+    Pieces of [lo, hi) not covered by `spans`, and the merged spans once they are.
+    Only the request's own range is added, so gaps between reads stay unexpanded.
+    """
+    pieces, cursor = [], lo
+    for a, b in spans:
+        if b <= cursor or a >= hi:
+            continue
+        if a > cursor:
+            pieces.append((cursor, a))
+        cursor = max(cursor, b)
+    if cursor < hi:
+        pieces.append((cursor, hi))
+
+    merged = []
+    for a, b in sorted(spans + [(lo, hi)]):
+        if merged and a <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return pieces, merged
+
+
+def materialize_due(user_id: str, start: Union[datetime, None] = None, end: Union[datetime, None] = None,
+                    live_only: bool = False):
+    """
+    Write the occurrences of the user's rules that fall in [start, end] and haven't
+    been written before. `start=None` means from each rule's start, `end=None` means now;
+    occurrences after now are only written when `end` explicitly asks for them.
+    `live_only` (catch_up) expands each rule from its `live_until` to now instead.
+    The unique (recurring_id, created_at) index drops repeats from concurrent readers.
+    Returns the number of expenses written.
+    """
+    from models.expense_model import build_expense_doc, add_expenses_bulk
+
+    now = datetime.now(timezone.utc)
+    hi = _utc(end) + MS if end else now
+    query = {"user_id": str(user_id), "active": True}
+    if live_only:
+        query["live_until"] = {"$ne": None}
+    written = 0
+    for rule in mongo.db.recurring_rules.find(query):
+        live_until = _live_until(rule)
+        if live_only:
+            if live_until is None:
+                continue
+            lo = live_until
+        else:
+            lo = max(_utc(start), _utc(rule["start"])) if start else _utc(rule["start"])
+        if rule.get("until") is not None:
+            hi_rule = min(hi, _utc(rule["until"]) + MS)
+        else:
+            hi_rule = hi
+        if lo >= hi_rule:
+            continue
+        lo, hi_rule = _snap(rule, lo, hi_rule)
+        pieces, spans = _missing(_spans(rule), lo, hi_rule)
+        if end is None:
+            # ✅ an open-ended read covered everything up to now; catch_up continues from here
+            live_until = max(live_until or hi_rule, hi_rule)
+
+        docs = []
+        for piece_lo, piece_hi in pieces:
+            for at in occurrences(rule, piece_lo, piece_hi):
+                doc = build_expense_doc(user_id, rule["category"], int(rule["paise"]) / 100, rule["note"], at)
+                doc["recurring_id"] = rule["_id"]
+                docs.append(doc)
+        if not docs and spans == _spans(rule) and live_until == _live_until(rule):
+            continue  # ✅ nothing new; don't write to the rule on every read
+        failed = add_expenses_bulk(docs)
+        written += len(docs) - len(failed)
+        mongo.db.recurring_rules.update_one(
+            {"_id": rule["_id"], "spans": rule.get("spans")},  # ✅ compare-and-set
+            {"$set": {"spans": [list(x) for x in spans], "live_until": live_until}},
+        )
+    if written:
+        bump_version(user_id, "expenses")
+    return written
+
+
+def catch_up(user_id: str):
+    """
+    Write occurrences that have fallen due since an open-ended read, so a client
+    revalidating an ETag for "everything up to now" sees them. Reads of past ranges
+    don't set `live_until`, so they never make this expand from where they stopped.
+    """
+    return materialize_due(user_id, None, None, live_only=True)
+
+
+def catch_up_due():
+    """
+    Scheduler job (see app.py): catch up every user with an occurrence that has fallen due
+    since their last open-ended read. live_until is that next occurrence, so this is one
+    indexed query when nothing is due. Writes bump the user's version, which is what lets
+    @versioned answer If-None-Match without running catch_up itself.
+    """
+    now = datetime.now(timezone.utc)
+    users = mongo.db.recurring_rules.distinct("user_id", {"active": True, "live_until": {"$lte": now}})
+    return sum(catch_up(user_id) for user_id in users)
+
+
+def stop_rule(user_id: str, rule_id: str):
+    """
+    Deactivate a rule and drop its occurrences dated after now.
+    Returns the number of future occurrences removed, or None if no such rule.
+    """
+    from models.expense_model import delete_expenses_bulk
+
+    res = mongo.db.recurring_rules.update_one(
+        {"_id": ObjectId(rule_id), "user_id": str(user_id), "active": True},
+        {"$set": {"active": False}},
+    )
+    if res.matched_count == 0:
+        return None
+    future = [x["_id"] for x in mongo.db.expenses.find(
+        {"recurring_id": ObjectId(rule_id), "created_at": {"$gt": datetime.now(timezone.utc)}},
+        {"_id": 1},
+    )]
+    if not future:
+        return 0
+    # ✅ one bulk delete, rollup/budget update and tombstone write, however many occurrences
+    outcome = delete_expenses_bulk(user_id, future)
+    return sum(1 for status in outcome.values() if status == "deleted")
@@ -0,0 +1,250 @@
+from database import mongo
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+from typing import Union
+import pytz
+from models.expense_schema import PAISE, paise_of, user_match
+from models.recurring_model import materialize_due
+
+# One doc per (user_id, day, category): {user_id, day, category, paise, count}
+# `day` is the start (as a UTC instant) of the ROLLUP_TZ calendar day the expense's
+# created_at falls on; `user_id` is the user's id as a string whichever schema version
+# the expenses are in. Days are cut in the app's default zone, so the default charts and
+# budget months are whole buckets. Changing ROLLUP_TZ needs `flask rebuild-rollups`.
+ROLLUP_TZ = "Asia/Kolkata"
+_ZONE = pytz.timezone(ROLLUP_TZ)
+
+
+def day_bucket(dt: datetime):
+    """
+    Start of the ROLLUP_TZ day holding a created_at value (naive datetimes from Mongo are UTC),
+    as an aware UTC datetime.
+    """
+    local = _as_utc(dt).astimezone(_ZONE)
+    return _ZONE.localize(datetime(local.year, local.month, local.day)).astimezone(timezone.utc)
+
+
+def _next_day(day: datetime):
+    # noon of the following day, then back to its midnight: right across DST changes too
+    return day_bucket(day + timedelta(hours=36))
+
+
+def _bucket_ops(docs: list, sign: int = 1):
+    deltas = {}
+    for d in docs:
+        key = (str(d["user_id"]), day_bucket(d["created_at"]), d["category"])
+        paise, count = deltas.get(key, (0, 0))
+        deltas[key] = (paise + sign * paise_of(d), count + sign)
+    return [
+        UpdateOne(
+            {"user_id": user_id, "day": day, "category": category},
+            {"$inc": {"paise": paise, "count": count}},
+            upsert=True,
+        )
+        for (user_id, day, category), (paise, count) in deltas.items()
+    ]
+
+
+def apply_rollup(docs: list, sign: int = 1):
+    """
+    Add (sign=1) or remove (sign=-1) expense docs from their day/category buckets.
+    Rows landing in the same bucket are folded into one $inc.
+    """
+    ops = _bucket_ops(docs, sign)
+    if ops:
+        mongo.db.expense_rollups.bulk_write(ops, ordered=False)
+
+
+def replace_in_rollup(old: dict, new: dict):
+    """
+    Move an edited expense between buckets (or adjust its amount in place).
+    """
+    replace_many_in_rollup([old], [new])
+
+
+def replace_many_in_rollup(olds: list, news: list):
+    """
+    replace_in_rollup for a batch of edits, in one bulk_write.
+    """
+    ops = _bucket_ops(olds, -1) + _bucket_ops(news, 1)
+    if ops:
+        mongo.db.expense_rollups.bulk_write(ops, ordered=False)
+
+
+def _split_range(start: Union[datetime, None], end: Union[datetime, None]):
+    """
+    Split [start, end] into an exact-timestamp head, a run of whole days served by
+    the rollups, and an exact-timestamp tail. Head/tail cover at most one day each.
+    Returns (head, (first_day, last_day_exclusive), tail); head/tail are (lo, hi) or None.
+    """
+    head = tail = None
+    first_day = last_day = None
+    if start is not None:
+        first_day = day_bucket(start)
+        if first_day != _as_utc(start):
+            first_day = _next_day(first_day)
+            head = (start, first_day)
+    if end is not None:
+        last_day = day_bucket(end)
+        tail = (last_day, end)
+    if first_day is not None and last_day is not None and last_day < first_day:
+        # range sits inside a single day; answer it from expenses directly
+        return (start, end), None, None
+    return head, (first_day, last_day), tail
+
+
+def _as_utc(dt: datetime):
+    return dt.astimezone(timezone.utc) if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def _raw_match(user_id: str, lo, hi, hi_inclusive: bool):
+    return {**user_match(user_id), "created_at": {"$gte": lo, ("$lte" if hi_inclusive else "$lt"): hi}}
+
+
+def rollup_totals(user_id: str, start=None, end=None):
+    """
+    {category: paise} for [start, end] from day buckets, with partial days at the
+    edges of the range read from expenses so the result is exact.
+    """
+    head, days, tail = _split_range(start, end)
+    totals = {}
+
+    def add(rows):
+        for r in rows:
+            if r["count"] > 0:
+                totals[r["_id"]] = totals.get(r["_id"], 0) + r["paise"]
+
+    if days is not None:
+        match = {"user_id": str(user_id)}
+        first_day, last_day = days
+        if first_day is not None or last_day is not None:
+            match["day"] = {}
+            if first_day is not None:
+                match["day"]["$gte"] = first_day
+            if last_day is not None:
+                match["day"]["$lt"] = last_day
+        add(mongo.db.expense_rollups.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$category", "paise": {"$sum": "$paise"}, "count": {"$sum": "$count"}}},
+        ]))
+
+    for part, inclusive in ((head, False), (tail, True)):
+        if part is None:
+            continue
+        inclusive = inclusive or days is None
+        add(mongo.db.expenses.aggregate([
+            {"$match": _raw_match(user_id, part[0], part[1], inclusive)},
+            {"$group": {"_id": "$category", "paise": {"$sum": PAISE}, "count": {"$sum": 1}}},
+        ]))
+    return totals
+
+
+def rollup_summary_by_category(user_id: str, start=None, end=None):
+    """
+    Totals per category from day buckets; partial days at the edges of the
+    range are read from expenses so results are exact.
+    """
+    materialize_due(user_id, start, end)
+    totals = rollup_totals(user_id, start, end)
+    out = [{"category": k, "total": v / 100} for k, v in totals.items()]
+    out.sort(key=lambda r: r["total"], reverse=True)
+    return out
+
+
+def whole_days(start: Union[datetime, None], end: Union[datetime, None]):
+    """
+    (first_day, last_day_exclusive) when [start, end] is made of whole ROLLUP_TZ days (either
+    side may be open, i.e. None), else None. `end` counts as a day's end from 23:59:59.999,
+    the last instant Mongo's millisecond dates can hold.
+    """
+    first_day = last_day = None
+    if start is not None:
+        first_day = day_bucket(start)
+        if first_day != _as_utc(start):
+            return None
+    if end is not None:
+        last_day = day_bucket(_as_utc(end) + timedelta(milliseconds=1))
+        if _as_utc(end) + timedelta(milliseconds=1) - last_day >= timedelta(milliseconds=1):
+            return None
+    return first_day, last_day
+
+
+def rollup_spend_over_time(user_id: str, period: str = "month", start=None, end=None):
+    """
+    Spend per day/week/month in ROLLUP_TZ built from day buckets: the same rows as
+    agg_spend_over_time(..., tz=ROLLUP_TZ). start/end must be whole days (see whole_days);
+    other ranges and zones need the raw aggregation.
+    """
+    first_day, last_day = whole_days(start, end)
+    materialize_due(user_id, start, end)
+    match = {"user_id": str(user_id)}
+    if first_day is not None or last_day is not None:
+        match["day"] = {}
+        if first_day is not None:
+            match["day"]["$gte"] = first_day
+        if last_day is not None:
+            match["day"]["$lt"] = last_day
+
+    # ✅ at most one row per day in range; weeks/months are folded here, in the bucket zone
+    buckets = {}
+    for row in mongo.db.expense_rollups.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$day", "paise": {"$sum": "$paise"}, "count": {"$sum": "$count"}}},
+    ]):
+        if row["count"] <= 0:
+            continue
+        local = _as_utc(row["_id"]).astimezone(_ZONE).date()
+        if period == "day":
+            first, label = local, local.isoformat()
+        elif period == "week":
+            first = local - timedelta(days=local.weekday())
+            label = "%d-W%02d" % local.isocalendar()[:2]
+        else:
+            first, label = local.replace(day=1), local.strftime("%Y-%m")
+        bucket = buckets.setdefault(label, {"first": first, "paise": 0})
+        bucket["paise"] += row["paise"]
+
+    rows = []
+    for label, b in sorted(buckets.items(), key=lambda kv: kv[1]["first"]):
+        # same shape as agg_spend_over_time: the bucket's first instant (naive UTC, as Mongo returns it)
+        first = _ZONE.localize(datetime.combine(b["first"], datetime.min.time()))
+        rows.append({"period": label, "start": first.astimezone(timezone.utc).replace(tzinfo=None),
+                     "total": b["paise"] / 100})
+    return rows
+
+
+def rebuild_rollups(user_id: Union[str, None] = None):
+    """
+    Recompute buckets from the expenses collection (all users when user_id is None).
+    Used for backfills and to repair drift; writes arriving mid-rebuild for the same
+    user may need another pass.
+    """
+    match = {"user_id": str(user_id)} if user_id else {}
+    mongo.db.expense_rollups.delete_many(match)
+    mongo.db.expenses.aggregate([
+        {"$match": user_match(user_id) if user_id else {}},
+        {"$group": {
+            "_id": {
+                "user_id": {"$toString": "$user_id"},
+                "day": {"$dateTrunc": {"date": "$created_at", "unit": "day", "timezone": ROLLUP_TZ}},
+                "category": "$category",
+            },
+            "paise": {"$sum": PAISE},
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id.user_id",
+            "day": "$_id.day",
+            "category": "$_id.category",
+            "paise": 1,
+            "count": 1,
+        }},
+        {"$merge": {
+            "into": "expense_rollups",
+            "on": ["user_id", "day", "category"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert",
+        }},
+    ])
+    return mongo.db.expense_rollups.count_documents(match)
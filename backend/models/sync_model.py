@@ -0,0 +1,49 @@
+from database import mongo
+from datetime import datetime, timezone
+from typing import Union
+from models.expense_schema import user_match
+
+# Deleted documents leave a tombstone {user_id, collection, doc_id, deleted_at}
+# so /api/sync can report them; a TTL index (see database.py) drops them after TOMBSTONE_TTL.
+SYNC_COLLECTIONS = ("expenses", "emis", "loans")
+
+
+def record_tombstone(user_id: str, collection: str, doc_id):
+    mongo.db.tombstones.insert_one({
+        "user_id": str(user_id),
+        "collection": collection,
+        "doc_id": str(doc_id),
+        "deleted_at": datetime.now(timezone.utc),
+    })
+
+
+def record_tombstones(user_id: str, collection: str, doc_ids: list):
+    if not doc_ids:
+        return
+    now = datetime.now(timezone.utc)
+    mongo.db.tombstones.insert_many([
+        {"user_id": str(user_id), "collection": collection, "doc_id": str(d), "deleted_at": now}
+        for d in doc_ids
+    ])
+
+
+def changed_since(user_id: str, collection: str, since: Union[datetime, None], limit: Union[int, None] = None):
+    """
+    Docs in `collection` inserted or updated at/after `since` (all docs when since is None).
+    With a limit, returns up to limit + 1 rows so the caller can detect overflow.
+    """
+    query = user_match(user_id) if collection == "expenses" else {"user_id": str(user_id)}
+    if since is not None:
+        query["updated_at"] = {"$gte": since}
+    cur = mongo.db[collection].find(query)
+    if limit is not None:
+        cur = cur.sort("updated_at", 1).limit(limit + 1)
+    return list(cur)
+
+
+def deleted_since(user_id: str, collection: str, since: datetime):
+    cur = mongo.db.tombstones.find(
+        {"user_id": str(user_id), "collection": collection, "deleted_at": {"$gte": since}},
+        {"_id": 0, "doc_id": 1}
+    )
+    return sorted({x["doc_id"] for x in cur})
@@ -0,0 +1,20 @@
+from database import mongo
+
+# One doc per user: {_id: user_id, expenses: 3, emis: 1, ...}
+# Every write path bumps the counter for the collection it touched, so a
+# read endpoint can tell whether anything changed without running its query.
+
+
+def bump_version(user_id: str, *collections: str):
+    if not collections:
+        return
+    mongo.db.data_versions.update_one(
+        {"_id": str(user_id)},
+        {"$inc": {c: 1 for c in collections}},
+        upsert=True,
+    )
+
+
+def get_version(user_id: str, collection: str):
+    doc = mongo.db.data_versions.find_one({"_id": str(user_id)}, {collection: 1})
+    return (doc or {}).get(collection, 0)
@@ -0,0 +1,40 @@
+# routes/budget_routes.py
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models.budget_model import goal_status, set_goals
+from utils.validation import validate_category, validate_amount
+
+budget_bp = Blueprint("budget_bp", __name__)
+
+
+@budget_bp.get("/api/goals")
+@jwt_required()
+def get_goals():
+    """
+    Current month's goals, spend per category and which categories have already alerted.
+    """
+    return jsonify(goal_status(get_jwt_identity())), 200
+
+
+@budget_bp.put("/api/goals")
+@jwt_required()
+def put_goals():
+    """
+    Body: {"goals": {"Food": 5000, ...}} (or the map itself). Replaces all goals;
+    a category set to 0 or null has no goal.
+    Breaches are emailed from the expense write path, once per category per month.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(force=True) or {}
+    goals = data.get("goals", data) if isinstance(data, dict) else None
+    if not isinstance(goals, dict):
+        return jsonify({"msg": "goals must be an object of category: amount"}), 400
+    cleaned = {}
+    try:
+        for category, amount in goals.items():
+            validate_category(category, user_id)
+            if amount not in (None, "", 0):
+                cleaned[category] = validate_amount(amount)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    return jsonify(set_goals(user_id, cleaned)), 200
@@ -6,6 +6,11 @@ from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 from email.utils import parseaddr
 from routes.notification_routes import send_email  # reuse SMTP sender
+from models.sync_model import record_tombstone
+from models.version_model import bump_version
+from utils.http_cache import versioned
+from utils.idempotency import idempotent
+from utils.response_format import parse_fields, mongo_projection, serialize, wants_columnar, to_columns
 
 emi_bp = Blueprint("emi_bp", __name__)
 
@@ -13,29 +18,50 @@ emi_bp = Blueprint("emi_bp", __name__)
 def _parse_iso(dt_str):
     return datetime.fromisoformat(dt_str).astimezone(timezone.utc)
 
-def _as_dict(doc):
-    return {
-        "id": str(doc["_id"]),
-        "title": doc["title"],
-        "description": doc.get("description", ""),
-        "amount": float(doc["amount"]),
-        "due_date": doc["due_date"].isoformat(),
-        "created_at": doc["created_at"].isoformat(),
-        "status": doc.get("status", "pending")
-    }
+_EMI_SERIALIZERS = {
+    "id": lambda doc: str(doc["_id"]),
+    "title": lambda doc: doc["title"],
+    "description": lambda doc: doc.get("description", ""),
+    "amount": lambda doc: float(doc["amount"]),
+    "due_date": lambda doc: doc["due_date"].isoformat(),
+    "created_at": lambda doc: doc["created_at"].isoformat(),
+    "status": lambda doc: doc.get("status", "pending"),
+}
+EMI_FIELDS = tuple(_EMI_SERIALIZERS)
 
-def _as_loan_dict(doc):
-    return {
-        "id": str(doc["_id"]),
-        "title": doc["title"],
-        "description": doc.get("description", ""),
-        "principal": float(doc["principal"]),
-        "interest_rate": float(doc["interest_rate"]),
-        "start_date": doc["start_date"].isoformat(),
-        "tenure_months": int(doc["tenure_months"]),
-        "emi_amount": float(doc["emi_amount"]),
-        "created_at": doc["created_at"].isoformat()
-    }
+_LOAN_SERIALIZERS = {
+    "id": lambda doc: str(doc["_id"]),
+    "title": lambda doc: doc["title"],
+    "description": lambda doc: doc.get("description", ""),
+    "principal": lambda doc: float(doc["principal"]),
+    "interest_rate": lambda doc: float(doc["interest_rate"]),
+    "start_date": lambda doc: doc["start_date"].isoformat(),
+    "tenure_months": lambda doc: int(doc["tenure_months"]),
+    "emi_amount": lambda doc: float(doc["emi_amount"]),
+    "created_at": lambda doc: doc["created_at"].isoformat(),
+}
+LOAN_FIELDS = tuple(_LOAN_SERIALIZERS)
+
+def _as_dict(doc, fields=EMI_FIELDS):
+    return serialize(doc, _EMI_SERIALIZERS, fields)
+
+def _as_loan_dict(doc, fields=LOAN_FIELDS):
+    return serialize(doc, _LOAN_SERIALIZERS, fields)
+
+def _list_response(cur, serializers, all_fields):
+    """
+    Shared body for list endpoints: honours ?fields= and ?format=columnar.
+    `cur` is a callable taking a Mongo projection and returning the cursor.
+    """
+    try:
+        fields = parse_fields(request.args.get("fields"), all_fields)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    projection = mongo_projection(fields) if request.args.get("fields") else None
+    docs = cur(projection)
+    if wants_columnar(request.args):
+        return jsonify(to_columns(docs, serializers, fields))
+    return jsonify([serialize(x, serializers, fields) for x in docs])
 
 def _calc_emi(principal, annual_rate_percent, n_months):
     r = (annual_rate_percent / 100.0) / 12.0
@@ -48,6 +74,7 @@ def _calc_emi(principal, annual_rate_percent, n_months):
 # ---------- EMI CRUD ----------
 @emi_bp.post("/api/emis")
 @jwt_required()
+@idempotent
 def create_emi():
     user_id = get_jwt_identity()
     data = request.get_json(force=True) or {}
@@ -65,18 +92,23 @@ def create_emi():
         "amount": amount,
         "due_date": _parse_iso(due_date),
         "status": "pending",
-        "created_at": datetime.now(timezone.utc)
+        "created_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc)
     }
     ins = mongo.db.emis.insert_one(doc)
     doc["_id"] = ins.inserted_id
+    bump_version(user_id, "emis")
     return jsonify(_as_dict(doc)), 201
 
 @emi_bp.get("/api/emis")
 @jwt_required()
+@versioned("emis")
 def list_emis():
     user_id = get_jwt_identity()
-    cur = mongo.db.emis.find({"user_id": user_id}).sort("due_date", 1)
-    return jsonify([_as_dict(x) for x in cur])
+    return _list_response(
+        lambda proj: mongo.db.emis.find({"user_id": user_id}, proj).sort("due_date", 1),
+        _EMI_SERIALIZERS, EMI_FIELDS
+    )
 
 @emi_bp.patch("/api/emis/<emi_id>")
 @jwt_required()
@@ -90,6 +122,7 @@ def update_emi(emi_id):
         updates["amount"] = float(payload["amount"])
     if "due_date" in payload:
         updates["due_date"] = _parse_iso(payload["due_date"])
+    updates["updated_at"] = datetime.now(timezone.utc)
 
     res = mongo.db.emis.update_one(
         {"_id": ObjectId(emi_id), "user_id": user_id},
@@ -97,6 +130,7 @@ def update_emi(emi_id):
     )
     if res.matched_count == 0:
         return jsonify({"msg": "not_found"}), 404
+    bump_version(user_id, "emis")
     doc = mongo.db.emis.find_one({"_id": ObjectId(emi_id)})
     return jsonify(_as_dict(doc)), 200
 
@@ -107,11 +141,14 @@ def delete_emi(emi_id):
     res = mongo.db.emis.delete_one({"_id": ObjectId(emi_id), "user_id": user_id})
     if res.deleted_count == 0:
         return jsonify({"msg": "not_found"}), 404
+    record_tombstone(user_id, "emis", emi_id)
+    bump_version(user_id, "emis")
     return jsonify({"msg": "deleted"}), 200
 
 # ---------- Loans CRUD ----------
 @emi_bp.post("/api/loans")
 @jwt_required()
+@idempotent
 def create_loan():
     user_id = get_jwt_identity()
     data = request.get_json(force=True) or {}
@@ -135,18 +172,23 @@ def create_loan():
         "tenure_months": tenure,
         "start_date": _parse_iso(start_date),
         "emi_amount": emi_amt,
-        "created_at": datetime.now(timezone.utc)
+        "created_at": datetime.now(timezone.utc),
+        "updated_at": datetime.now(timezone.utc)
     }
     ins = mongo.db.loans.insert_one(doc)
     doc["_id"] = ins.inserted_id
+    bump_version(user_id, "loans")
     return jsonify(_as_loan_dict(doc)), 201
 
 @emi_bp.get("/api/loans")
 @jwt_required()
+@versioned("loans")
 def list_loans():
     user_id = get_jwt_identity()
-    cur = mongo.db.loans.find({"user_id": user_id}).sort("created_at", -1)
-    return jsonify([_as_loan_dict(x) for x in cur])
+    return _list_response(
+        lambda proj: mongo.db.loans.find({"user_id": user_id}, proj).sort("created_at", -1),
+        _LOAN_SERIALIZERS, LOAN_FIELDS
+    )
 
 @emi_bp.patch("/api/loans/<loan_id>")
 @jwt_required()
@@ -168,8 +210,10 @@ def update_loan(loan_id):
     rate = float(updates.get("interest_rate", doc["interest_rate"]))
     tenure = int(updates.get("tenure_months", doc["tenure_months"]))
     updates["emi_amount"] = _calc_emi(principal, rate, tenure)
+    updates["updated_at"] = datetime.now(timezone.utc)
 
     res = mongo.db.loans.update_one({"_id": ObjectId(loan_id), "user_id": user_id}, {"$set": updates})
+    bump_version(user_id, "loans")
     doc = mongo.db.loans.find_one({"_id": ObjectId(loan_id)})
     return jsonify(_as_loan_dict(doc)), 200
 
@@ -180,6 +224,8 @@ def delete_loan(loan_id):
     res = mongo.db.loans.delete_one({"_id": ObjectId(loan_id), "user_id": user_id})
     if res.deleted_count == 0:
         return jsonify({"msg": "not_found"}), 404
+    record_tombstone(user_id, "loans", loan_id)
+    bump_version(user_id, "loans")
     return jsonify({"msg": "deleted"}), 200
 
 # ---------- Due Soon (for popups) ----------
@@ -1,38 +1,93 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from datetime import datetime, timezone
+import json
+import pytz
 from typing import Union
 from bson import ObjectId
-from database import mongo
 from models.expense_model import (
-    add_expense, get_expenses, delete_expense, update_expense,
-    agg_summary_by_category, agg_spend_over_time
+    add_expense, add_expenses_bulk, build_expense_doc, import_expense_batch,
+    get_expenses, get_expenses_page, iter_expenses, delete_expense, update_expense,
+    update_expenses_bulk, delete_expenses_bulk,
+    agg_spend_over_time, agg_dashboard, search_expenses, expense_columns,
+    AMOUNT_FACET_BOUNDARIES, SERIES_PERIODS
+)
+from models.expense_schema import amount_of
+from models.rollup_model import rollup_summary_by_category, rollup_spend_over_time, whole_days, ROLLUP_TZ
+from utils.validation import validate_category, validate_amount, parse_utc
+from models.category_model import all_categories, custom_categories, add_category, remove_category, validate_new_name
+from utils.pagination import parse_limit, encode_cursor, decode_cursor
+from models.version_model import bump_version
+from models.recurring_model import FREQUENCIES, create_rule, list_rules, stop_rule, catch_up
+from utils.http_cache import versioned, cached
+from utils.idempotency import idempotent
+from utils.response_format import parse_fields, mongo_projection, serialize, wants_columnar, to_columns
+from utils.expense_stats import spending_stats, DEFAULT_WINDOW_DAYS, DEFAULT_Z_THRESHOLD
+from utils.statement_import import (
+    iter_csv_rows, iter_ofx_rows, detect_format, categorize, ContentHasher
 )
-from utils.validation import validate_category, validate_amount, ALLOWED_CATEGORIES
 
 expense_bp = Blueprint("expenses", __name__)
 
-# --- Helper to parse ISO dates safely ---
-def _parse_utc(dt_str: str):
-    if not dt_str:
-        return None
-    dt = datetime.fromisoformat(dt_str)
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    else:
-        dt = dt.astimezone(timezone.utc)
-    return dt
+DEFAULT_TZ = "Asia/Kolkata"
+MAX_BULK_ROWS = 10000
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_ERRORS = 50
+
+_EXPENSE_SERIALIZERS = {
+    "id": lambda x: str(x["_id"]),
+    "category": lambda x: x["category"],
+    "amount": amount_of,
+    "note": lambda x: x.get("note", ""),
+    "created_at": lambda x: x["created_at"].isoformat(),
+}
+EXPENSE_FIELDS = tuple(_EXPENSE_SERIALIZERS)
+_EXPENSE_STORED = {"amount": ("amount", "paise")}  # v1 and v2 amount fields
+
 
+def _as_dict(x, fields=EXPENSE_FIELDS):
+    return serialize(x, _EXPENSE_SERIALIZERS, fields)
 
-# ✅ List allowed categories
+
+# ✅ List allowed categories (built-in + the caller's own when a token is sent)
 @expense_bp.get("/categories")
 def list_categories():
-    return jsonify({"categories": ALLOWED_CATEGORIES})
+    verify_jwt_in_request(optional=True)
+    user_id = get_jwt_identity()
+    return jsonify({
+        "categories": all_categories(user_id),
+        "custom": sorted(custom_categories(user_id)) if user_id else [],
+    })
+
+
+# ✅ Add a custom category
+@expense_bp.post("/categories")
+@jwt_required()
+def create_category():
+    user_id = get_jwt_identity()
+    data = request.get_json(force=True) or {}
+    try:
+        name = validate_new_name(data.get("name"))
+        custom = add_category(user_id, name)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    return jsonify({"categories": all_categories(user_id), "custom": custom}), 201
+
+
+# ✅ Remove a custom category (existing expenses keep it)
+@expense_bp.delete("/categories/<name>")
+@jwt_required()
+def delete_category(name):
+    user_id = get_jwt_identity()
+    if not remove_category(user_id, name):
+        return jsonify({"msg": "Not found"}), 404
+    return jsonify({"categories": all_categories(user_id), "custom": sorted(custom_categories(user_id))}), 200
 
 
 # ✅ Add new expense
 @expense_bp.post("/expenses")
 @jwt_required()
+@idempotent
 def create_expense():
     user_id = get_jwt_identity()
     data = request.get_json(force=True)
@@ -42,16 +97,123 @@ def create_expense():
     note = data.get("note")
     date = data.get("date")  # ← optional custom date (ISO format)
 
-    validate_category(category)
+    validate_category(category, user_id)
     amount = validate_amount(amount)
 
     add_expense(user_id, category, amount, note, date)
+    bump_version(user_id, "expenses")
     return jsonify({"msg": "Expense added"}), 201
 
 
+# ✅ Add many expenses in one round trip
+@expense_bp.post("/expenses/bulk")
+@jwt_required()
+def create_expenses_bulk():
+    """
+    Body: [{category, amount, note?, date?}, ...] or {"items": [...]}
+    Returns a per-row report; invalid rows are rejected without failing the batch.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(force=True)
+    rows = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"msg": "a non-empty list of expenses is required"}), 400
+    if len(rows) > MAX_BULK_ROWS:
+        return jsonify({"msg": f"at most {MAX_BULK_ROWS} expenses per request"}), 413
+
+    results = [None] * len(rows)
+    docs, positions = [], []
+    for i, row in enumerate(rows):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("invalid row")
+            validate_category(row.get("category"), user_id)
+            amount = validate_amount(row.get("amount"))
+        except ValueError as e:
+            results[i] = {"index": i, "status": "rejected", "error": str(e)}
+            continue
+        docs.append(build_expense_doc(user_id, row["category"], amount, row.get("note"), row.get("date")))
+        positions.append(i)
+
+    failed = add_expenses_bulk(docs)
+    for j, (i, doc) in enumerate(zip(positions, docs)):
+        if j in failed:
+            results[i] = {"index": i, "status": "rejected", "error": failed[j]}
+        else:
+            results[i] = {"index": i, "status": "accepted", "id": str(doc["_id"])}
+
+    accepted = sum(1 for r in results if r["status"] == "accepted")
+    if accepted:
+        bump_version(user_id, "expenses")
+    return jsonify({
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results
+    }), 201 if accepted else 400
+
+
+# ✅ Import a bank / card statement (CSV or OFX)
+@expense_bp.post("/expenses/import")
+@jwt_required()
+def import_statement():
+    """
+    multipart/form-data with a `file` field; ?format=csv|ofx overrides the extension.
+    Debits become expenses; credits are skipped unless ?include_credits=1 (stored as Income).
+    Rows are parsed one at a time and written in batches, so memory stays flat
+    regardless of statement size. Already-imported rows are reported as duplicates.
+    """
+    user_id = get_jwt_identity()
+    upload = request.files.get("file")
+    if upload is None:
+        return jsonify({"msg": "file is required"}), 400
+    try:
+        fmt = detect_format(upload.filename, request.args.get("format"))
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    include_credits = request.args.get("include_credits") == "1"
+
+    rows = iter_ofx_rows(upload.stream) if fmt == "ofx" else iter_csv_rows(upload.stream)
+    content_hash = ContentHasher(user_id)
+    report = {"inserted": 0, "duplicates": 0, "skipped": 0, "errors": []}
+    batch = []
+
+    def flush():
+        inserted, dupes = import_expense_batch(user_id, batch)
+        report["inserted"] += inserted
+        report["duplicates"] += dupes
+        batch.clear()
+
+    try:
+        for row in rows:
+            if "error" in row:
+                report["skipped"] += 1
+                if len(report["errors"]) < MAX_IMPORT_ERRORS:
+                    report["errors"].append(row)
+                continue
+            if row["amount"] == 0 or (row["amount"] > 0 and not include_credits):
+                report["skipped"] += 1
+                continue
+
+            category = "Income" if row["amount"] > 0 else categorize(row["description"])
+            doc = build_expense_doc(user_id, category, abs(row["amount"]), row["description"], row["date"])
+            doc["import_hash"] = content_hash(row)
+            batch.append(doc)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+        flush()
+    except ValueError as e:
+        return jsonify({"msg": str(e), **report}), 400
+    finally:
+        if report["inserted"]:
+            bump_version(user_id, "expenses")
+
+    return jsonify(report), 200
+
+
 # ✅ Fetch all expenses (optional filters)
 @expense_bp.get("/expenses")
 @jwt_required()
+@versioned("expenses", refresh=catch_up)
 def list_expenses():
     user_id = get_jwt_identity()
     start_str = request.args.get("start")
@@ -60,17 +222,49 @@ def list_expenses():
     def parse(dt: Union[str, None]):
         return datetime.fromisoformat(dt).astimezone(timezone.utc) if dt else None
 
-    items = get_expenses(user_id, parse(start_str), parse(end_str))
-    return jsonify([
-        {
-            "id": str(x["_id"]),
-            "category": x["category"],
-            "amount": x["amount"],
-            "note": x.get("note", ""),
-            "created_at": x["created_at"].isoformat()
-        }
-        for x in items
-    ]), 200
+    # ✅ ?fields=id,amount,... trims both the Mongo projection and the response
+    try:
+        fields = parse_fields(request.args.get("fields"), EXPENSE_FIELDS)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    projection = mongo_projection(fields, stored=_EXPENSE_STORED) if request.args.get("fields") else None
+    columnar = wants_columnar(request.args)
+
+    # ✅ Streaming mode: one JSON object per line, rows encoded as the cursor yields them
+    if request.args.get("stream") == "1" or \
+            request.accept_mimetypes.best == "application/x-ndjson":
+        cursor = iter_expenses(user_id, parse(start_str), parse(end_str), projection=projection)
+
+        def generate():
+            try:
+                for x in cursor:
+                    yield json.dumps(_as_dict(x, fields)) + "\n"
+            finally:
+                cursor.close()
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    # ✅ Keyset pagination: ?limit=N&cursor=<next token from previous page>
+    if "limit" in request.args or "cursor" in request.args:
+        try:
+            limit = parse_limit(request.args.get("limit"))
+            cursor = request.args.get("cursor")
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        rows, last = get_expenses_page(user_id, limit, after, parse(start_str), parse(end_str),
+                                       projection=projection)
+        return jsonify({
+            "items": to_columns(rows, _EXPENSE_SERIALIZERS, fields) if columnar
+                     else [_as_dict(x, fields) for x in rows],
+            "next": encode_cursor(*last) if last else None
+        }), 200
+
+    items = get_expenses(user_id, parse(start_str), parse(end_str), projection=projection)
+    if columnar:
+        return jsonify(to_columns(items, _EXPENSE_SERIALIZERS, fields)), 200
+    return jsonify([_as_dict(x, fields) for x in items]), 200
 
 
 # ✅ Delete expense
@@ -78,12 +272,9 @@ def list_expenses():
 @jwt_required()
 def remove_expense(expense_id):
     user_id = get_jwt_identity()
-    res = mongo.db.expenses.delete_one({
-        "_id": ObjectId(expense_id),
-        "user_id": str(user_id)
-    })
-    if res.deleted_count == 0:
+    if not delete_expense(user_id, expense_id):
         return jsonify({"msg": "Not found"}), 404
+    bump_version(user_id, "expenses")
     return jsonify({"msg": "Deleted"}), 200
 
 
@@ -96,41 +287,364 @@ def patch_expense(expense_id):
 
     updates = {}
     if "category" in data:
-        validate_category(data["category"])
+        validate_category(data["category"], user_id)
         updates["category"] = data["category"]
     if "amount" in data:
         updates["amount"] = validate_amount(data["amount"])
     if "note" in data:
         updates["note"] = data.get("note") or ""
 
-    res = mongo.db.expenses.update_one(
-        {"_id": ObjectId(expense_id), "user_id": str(user_id)},
-        {"$set": updates}
-    )
-    if res.matched_count == 0:
+    if not update_expense(user_id, expense_id, updates):
         return jsonify({"msg": "Not found"}), 404
+    bump_version(user_id, "expenses")
     return jsonify({"msg": "Updated"}), 200
 
 
+def _bulk_ids(rows, key):
+    """
+    Pull ObjectIds out of a batch body: one (index, raw_id, ObjectId, row, error) per row,
+    with error set (and no ObjectId) for malformed or repeated ids.
+    """
+    seen = set()
+    out = []
+    for i, row in enumerate(rows):
+        raw = row.get(key) if isinstance(row, dict) else row
+        oid = ObjectId(raw) if isinstance(raw, str) and ObjectId.is_valid(raw) else None
+        error = None
+        if oid is None:
+            error = "invalid id"
+        elif oid in seen:
+            error = "duplicate id"
+        else:
+            seen.add(oid)
+        out.append((i, raw, oid if error is None else None, row, error))
+    return out
+
+
+def _bulk_report(entries, outcome, ok_status):
+    results = []
+    for i, raw, oid, _, error in entries:
+        status = outcome.get(oid, "rejected") if error is None else "rejected"
+        r = {"index": i, "id": raw, "status": status}
+        if status not in (ok_status, "not_found", "conflict"):
+            r["status"], r["error"] = "rejected", error or status
+        results.append(r)
+    ok = sum(1 for r in results if r["status"] == ok_status)
+    return ok, results
+
+
+# ✅ Update many expenses in one round trip
+@expense_bp.patch("/expenses/bulk")
+@jwt_required()
+def patch_expenses_bulk():
+    """
+    Body: [{id, category?, amount?, note?}, ...] or {"items": [...]}
+    Returns a per-id report: updated | not_found | conflict (edited meanwhile) | rejected.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(force=True)
+    rows = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"msg": "a non-empty list of updates is required"}), 400
+    if len(rows) > MAX_BULK_ROWS:
+        return jsonify({"msg": f"at most {MAX_BULK_ROWS} updates per request"}), 413
+
+    entries = _bulk_ids(rows, "id")
+    changes = {}
+    for n, (i, raw, oid, row, error) in enumerate(entries):
+        if error:
+            continue
+        updates = {}
+        try:
+            if "category" in row:
+                validate_category(row["category"], user_id)
+                updates["category"] = row["category"]
+            if "amount" in row:
+                updates["amount"] = validate_amount(row["amount"])
+            if "note" in row:
+                updates["note"] = row.get("note") or ""
+            if not updates:
+                raise ValueError("nothing to update")
+        except ValueError as e:
+            entries[n] = (i, raw, None, row, str(e))
+            continue
+        changes[oid] = updates
+
+    outcome = update_expenses_bulk(user_id, changes) if changes else {}
+    updated, results = _bulk_report(entries, outcome, "updated")
+    if updated:
+        bump_version(user_id, "expenses")
+    return jsonify({"updated": updated, "failed": len(results) - updated, "results": results}), 200
+
+
+# ✅ Delete many expenses in one round trip
+@expense_bp.delete("/expenses/bulk")
+@jwt_required()
+def delete_expenses_in_bulk():
+    """
+    Body: ["<id>", ...] or {"ids": [...]}
+    Returns a per-id report: deleted | not_found | conflict (edited meanwhile) | rejected.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(force=True)
+    ids = data.get("ids") if isinstance(data, dict) else data
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"msg": "a non-empty list of ids is required"}), 400
+    if len(ids) > MAX_BULK_ROWS:
+        return jsonify({"msg": f"at most {MAX_BULK_ROWS} ids per request"}), 413
+
+    entries = _bulk_ids(ids, "id")
+    wanted = [oid for _, _, oid, _, error in entries if error is None]
+    outcome = delete_expenses_bulk(user_id, wanted) if wanted else {}
+    deleted, results = _bulk_report(entries, outcome, "deleted")
+    if deleted:
+        bump_version(user_id, "expenses")
+    return jsonify({"deleted": deleted, "failed": len(results) - deleted, "results": results}), 200
+
+
+def _rule_dict(r):
+    return {
+        "id": str(r["_id"]),
+        "category": r["category"],
+        "amount": int(r["paise"]) / 100,
+        "note": r.get("note", ""),
+        "freq": r["freq"],
+        "interval": r.get("interval", 1),
+        "start": r["start"].isoformat(),
+        "until": r["until"].isoformat() if r.get("until") else None,
+    }
+
+
+# ✅ Recurring expenses (rent, subscriptions, bills)
+@expense_bp.get("/expenses/recurring")
+@jwt_required()
+def get_recurring():
+    user_id = get_jwt_identity()
+    return jsonify([_rule_dict(r) for r in list_rules(user_id)]), 200
+
+
+@expense_bp.post("/expenses/recurring")
+@jwt_required()
+def add_recurring():
+    """
+    Body: {category, amount, note?, freq: daily|weekly|monthly|yearly, interval?, start?, until?}
+    Occurrences aren't written here; they appear as soon as a read covers their date.
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(force=True)
+
+    validate_category(data.get("category"), user_id)
+    amount = validate_amount(data.get("amount"))
+    freq = data.get("freq")
+    if freq not in FREQUENCIES:
+        return jsonify({"msg": "freq must be one of " + ", ".join(sorted(FREQUENCIES))}), 400
+    try:
+        interval = int(data.get("interval") or 1)
+        start = parse_utc(data.get("start")) or datetime.now(timezone.utc)
+        until = parse_utc(data.get("until"))
+    except (TypeError, ValueError):
+        return jsonify({"msg": "invalid interval, start or until"}), 400
+    if interval < 1:
+        return jsonify({"msg": "interval must be at least 1"}), 400
+    if until is not None and until < start:
+        return jsonify({"msg": "until must not be before start"}), 400
+
+    rule = create_rule(user_id, data["category"], amount, data.get("note"), freq, interval, start, until)
+    bump_version(user_id, "expenses")
+    return jsonify(_rule_dict(rule)), 201
+
+
+@expense_bp.delete("/expenses/recurring/<rule_id>")
+@jwt_required()
+def remove_recurring(rule_id):
+    """
+    Stop a rule. Past occurrences stay as ordinary expenses; future ones are removed.
+    """
+    user_id = get_jwt_identity()
+    if not ObjectId.is_valid(rule_id):
+        return jsonify({"msg": "Not found"}), 404
+    removed = stop_rule(user_id, rule_id)
+    if removed is None:
+        return jsonify({"msg": "Not found"}), 404
+    bump_version(user_id, "expenses")
+    return jsonify({"msg": "Stopped", "removed": removed}), 200
+
+
 # ✅ Summary by category
 @expense_bp.get("/expenses/summary")
 @jwt_required()
+@versioned("expenses", refresh=catch_up)
+@cached("expenses")
 def summary_by_category():
     user_id = get_jwt_identity()
     start = request.args.get("start")
     end = request.args.get("end")
-    start_dt = _parse_utc(start)
-    end_dt = _parse_utc(end)
+    start_dt = parse_utc(start)
+    end_dt = parse_utc(end)
 
-    data = agg_summary_by_category(user_id, start_dt, end_dt)
+    data = rollup_summary_by_category(user_id, start_dt, end_dt)
     return jsonify(data), 200
 
 
 # ✅ Spend over time
 @expense_bp.get("/expenses/series")
 @jwt_required()
+@versioned("expenses", refresh=catch_up)
+@cached("expenses")
 def spend_over_time():
+    """
+    Query: period=day|week|month|quarter|year, start/end (ISO), tz (default Asia/Kolkata).
+    """
     user_id = get_jwt_identity()
-    period = request.args.get("period", "month")  # day|week|month
-    data = agg_spend_over_time(user_id, period)
+    period = request.args.get("period", "month")
+    if period not in SERIES_PERIODS:
+        period = "month"
+    tz = request.args.get("tz", DEFAULT_TZ)
+    try:
+        pytz.timezone(tz)
+        start_dt = parse_utc(request.args.get("start"))
+        end_dt = parse_utc(request.args.get("end"))
+    except pytz.UnknownTimeZoneError:
+        return jsonify({"msg": "unknown timezone"}), 400
+    except ValueError:
+        return jsonify({"msg": "invalid start/end"}), 400
+
+    # ✅ the default zone's day/week/month over whole days comes from the day rollups (cut in
+    # ROLLUP_TZ); other zones cut days elsewhere, so they still need the raw aggregation
+    if tz == ROLLUP_TZ and period in {"day", "week", "month"} and whole_days(start_dt, end_dt):
+        data = rollup_spend_over_time(user_id, period, start_dt, end_dt)
+    else:
+        data = agg_spend_over_time(user_id, period, start_dt, end_dt, tz)
+    for row in data:
+        row["start"] = row["start"].isoformat()
     return jsonify(data), 200
+
+
+def _stats_day():
+    # open-ended stats run up to "now", so they change at the caller's midnight even without writes
+    if request.args.get("end"):
+        return ""
+    try:
+        return datetime.now(pytz.timezone(request.args.get("tz", DEFAULT_TZ))).date().isoformat()
+    except pytz.UnknownTimeZoneError:
+        return ""  # the view answers 400
+
+
+# ✅ Spending statistics and outliers
+@expense_bp.get("/expenses/stats")
+@jwt_required()
+@versioned("expenses", refresh=catch_up, vary=_stats_day)
+@cached("expenses", vary=_stats_day)
+def spending_statistics():
+    """
+    Query: start/end (ISO), tz (default Asia/Kolkata), window (days, default 30), z (default 3).
+    Per-category median / p90 / trailing daily mean / z-score outliers, plus month-over-month totals.
+    """
+    user_id = get_jwt_identity()
+    try:
+        tz = pytz.timezone(request.args.get("tz", DEFAULT_TZ))
+        start_dt = parse_utc(request.args.get("start"))
+        end_dt = parse_utc(request.args.get("end"))
+        window = int(request.args.get("window", DEFAULT_WINDOW_DAYS))
+        z = float(request.args.get("z", DEFAULT_Z_THRESHOLD))
+    except pytz.UnknownTimeZoneError:
+        return jsonify({"msg": "unknown timezone"}), 400
+    except ValueError:
+        return jsonify({"msg": "invalid start/end/window/z"}), 400
+    if window < 1 or z <= 0:
+        return jsonify({"msg": "window and z must be positive"}), 400
+
+    until = end_dt or datetime.now(timezone.utc)
+    # months are cut at the zone's current UTC offset (exact for zones without DST, like IST)
+    offset_ms = int(until.astimezone(tz).utcoffset().total_seconds() * 1000)
+    data = spending_stats(
+        expense_columns(user_id, start_dt, end_dt),
+        end_ms=int(until.timestamp() * 1000),
+        offset_ms=offset_ms,
+        window_days=window,
+        z_threshold=z,
+    )
+    return jsonify(data), 200
+
+
+# ✅ Dashboard bundle: every chart aggregate in one round trip
+@expense_bp.get("/expenses/dashboard")
+@jwt_required()
+@versioned("expenses", refresh=catch_up)
+def dashboard():
+    """
+    Query: start/end (ISO, optional), tz (default Asia/Kolkata).
+    """
+    user_id = get_jwt_identity()
+    tz = request.args.get("tz", DEFAULT_TZ)
+    try:
+        pytz.timezone(tz)
+        start_dt = parse_utc(request.args.get("start"))
+        end_dt = parse_utc(request.args.get("end"))
+    except pytz.UnknownTimeZoneError:
+        return jsonify({"msg": "unknown timezone"}), 400
+    except ValueError:
+        return jsonify({"msg": "invalid start/end"}), 400
+
+    data = agg_dashboard(user_id, start_dt, end_dt, tz)
+    totals = data["totals"][0] if data["totals"] else {"total": 0, "count": 0, "active_days": 0}
+    days = totals["active_days"] or 1
+
+    for x in data["top_expenses"]:
+        x["created_at"] = x["created_at"].isoformat()
+        x.setdefault("note", "")
+
+    return jsonify({
+        "totals": totals,
+        "daily": data["daily"],
+        "monthly": data["monthly"],
+        "by_category": data["by_category"],
+        "top_categories": data["by_category"][:5],
+        "avg_per_category": [
+            {"category": c["category"], "avg": round(c["total"] / days, 2)}
+            for c in data["by_category"]
+        ],
+        "top_expenses": data["top_expenses"],
+    }), 200
+
+
+# ✅ Search notes with category / amount / date facets
+@expense_bp.get("/expenses/search")
+@jwt_required()
+@versioned("expenses", refresh=catch_up)
+def search():
+    """
+    Query: q (words in the note), category (comma-separated), min, max, start, end, limit, skip.
+    Returns {items, total, facets: {categories, amounts}}.
+    """
+    user_id = get_jwt_identity()
+    args = request.args
+    categories = [c.strip() for c in (args.get("category") or "").split(",") if c.strip()]
+    try:
+        for c in categories:
+            validate_category(c, user_id)
+        min_amount = float(args["min"]) if args.get("min") else None
+        max_amount = float(args["max"]) if args.get("max") else None
+        start_dt = parse_utc(args.get("start"))
+        end_dt = parse_utc(args.get("end"))
+        limit = parse_limit(args.get("limit"), default=50)
+        skip = int(args.get("skip") or 0)
+        if skip < 0:
+            raise ValueError("invalid skip")
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    data = search_expenses(user_id, (args.get("q") or "").strip() or None, categories,
+                           min_amount, max_amount, start_dt, end_dt, limit, skip)
+
+    bounds = AMOUNT_FACET_BOUNDARIES
+    labels = {lo: f"{lo}-{hi}" for lo, hi in zip(bounds, bounds[1:])}
+    labels["above"] = f"{bounds[-1]}+"
+    return jsonify({
+        "items": [_as_dict(x) for x in data["items"]],
+        "total": data["total"][0]["n"] if data["total"] else 0,
+        "facets": {
+            "categories": data["categories"],
+            "amounts": [{"range": labels[b["_id"]], "count": b["count"]} for b in data["amounts"]],
+        },
+    }), 200
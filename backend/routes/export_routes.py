@@ -0,0 +1,316 @@
+# routes/export_routes.py
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson import ObjectId
+from database import mongo
+from models.expense_model import iter_expenses
+from models.expense_schema import amount_of, user_match
+from models.recurring_model import materialize_due
+from utils.export import EXPORT_FORMATS, export_chunks
+from utils.validation import parse_utc
+
+export_bp = Blueprint("export_bp", __name__)
+
+CURSOR_BATCH = 1000
+_executor = None
+
+
+# ---------- Sources: (columns, count(user_id, start, end), rows(user_id, start, end)) ----------
+_EXPENSE_COLUMNS = [
+    ("id", "string", lambda x: str(x["_id"])),
+    ("created_at", "timestamp", lambda x: x["created_at"]),
+    ("category", "string", lambda x: x["category"]),
+    ("amount", "float", amount_of),
+    ("note", "string", lambda x: x.get("note", "")),
+]
+
+_EMI_COLUMNS = [
+    ("id", "string", lambda x: str(x["_id"])),
+    ("title", "string", lambda x: x["title"]),
+    ("description", "string", lambda x: x.get("description", "")),
+    ("amount", "float", lambda x: float(x["amount"])),
+    ("due_date", "timestamp", lambda x: x["due_date"]),
+    ("status", "string", lambda x: x.get("status", "pending")),
+    ("created_at", "timestamp", lambda x: x["created_at"]),
+]
+
+_LOAN_COLUMNS = [
+    ("id", "string", lambda x: str(x["_id"])),
+    ("title", "string", lambda x: x["title"]),
+    ("description", "string", lambda x: x.get("description", "")),
+    ("principal", "float", lambda x: float(x["principal"])),
+    ("interest_rate", "float", lambda x: float(x["interest_rate"])),
+    ("start_date", "timestamp", lambda x: x["start_date"]),
+    ("tenure_months", "int", lambda x: int(x["tenure_months"])),
+    ("emi_amount", "float", lambda x: float(x["emi_amount"])),
+    ("created_at", "timestamp", lambda x: x["created_at"]),
+]
+
+_FINANCE_COLUMNS = [
+    ("date", "timestamp", lambda x: parse_utc(x["date"].replace("Z", "+00:00")) if x.get("date") else None),
+    ("net_worth", "float", lambda x: float(x.get("value") or 0)),
+]
+
+
+def _date_filter(field, start, end):
+    if not (start or end):
+        return {}
+    cond = {}
+    if start:
+        cond["$gte"] = start
+    if end:
+        cond["$lte"] = end
+    return {field: cond}
+
+
+def _expense_count(user_id, start, end):
+    materialize_due(user_id, start, end)  # ✅ count the recurring occurrences the export will include
+    return mongo.db.expenses.count_documents({**user_match(user_id), **_date_filter("created_at", start, end)})
+
+
+def _expense_rows(user_id, start, end):
+    materialize_due(user_id, start, end)  # no-op after _expense_count; background jobs skip the count
+    return iter_expenses(user_id, start, end, batch_size=CURSOR_BATCH)
+
+
+def _simple_source(collection, date_field, sort_field):
+    def count(user_id, start, end):
+        return mongo.db[collection].count_documents({"user_id": user_id, **_date_filter(date_field, start, end)})
+
+    def rows(user_id, start, end):
+        return (mongo.db[collection]
+                .find({"user_id": user_id, **_date_filter(date_field, start, end)})
+                .sort(sort_field, 1)
+                .batch_size(CURSOR_BATCH))
+    return count, rows
+
+
+def _js_iso(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def _finance_pipeline(user_id, start, end):
+    # snapshots are one array on the user's finance doc, dated with the browser's
+    # toISOString(), so a plain string range on the same format selects by time
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$unwind": "$snapshots"},
+        {"$replaceRoot": {"newRoot": "$snapshots"}},
+    ]
+    if start or end:
+        pipeline.append({"$match": _date_filter("date", start and _js_iso(start), end and _js_iso(end))})
+    return pipeline
+
+
+def _finance_count(user_id, start, end):
+    return next(mongo.db.finance.aggregate(_finance_pipeline(user_id, start, end) + [{"$count": "n"}]), {}).get("n", 0)
+
+
+def _finance_rows(user_id, start, end):
+    return mongo.db.finance.aggregate(_finance_pipeline(user_id, start, end), batchSize=CURSOR_BATCH)
+
+
+EXPORTS = {
+    "expenses": (_EXPENSE_COLUMNS, _expense_count, _expense_rows),
+    "emis": (_EMI_COLUMNS, *_simple_source("emis", "due_date", "due_date")),
+    "loans": (_LOAN_COLUMNS, *_simple_source("loans", "created_at", "created_at")),
+    "finance": (_FINANCE_COLUMNS, _finance_count, _finance_rows),
+}
+
+
+def _parse_request(collection):
+    """
+    Returns (fmt, start, end) or raises ValueError with a client-facing message.
+    """
+    if collection not in EXPORTS:
+        raise ValueError("collection must be one of " + ", ".join(EXPORTS))
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError("format must be csv or parquet")
+    try:
+        return fmt, parse_utc(request.args.get("start")), parse_utc(request.args.get("end"))
+    except ValueError:
+        raise ValueError("invalid start/end")
+
+
+def _filename(collection, fmt):
+    return f"{collection}-{datetime.now(timezone.utc):%Y%m%d}.{fmt}"
+
+
+# ---------- Direct download (streamed from the cursor) ----------
+@export_bp.get("/api/export/<collection>")
+@jwt_required()
+def export_stream(collection):
+    """
+    GET /api/export/<expenses|emis|loans|finance>?format=csv|parquet&start&end
+    Streams the file as it is read. Exports above EXPORT_SYNC_MAX_ROWS must go through
+    POST (a background job) so no request worker is tied up for the whole dump.
+    """
+    user_id = get_jwt_identity()
+    try:
+        fmt, start, end = _parse_request(collection)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    columns, count, rows = EXPORTS[collection]
+
+    limit = current_app.config["EXPORT_SYNC_MAX_ROWS"]
+    if count(user_id, start, end) > limit:
+        return jsonify({"msg": f"more than {limit} rows; start a background export with POST"}), 413
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401  (fail before the response starts, not halfway through)
+        except ImportError:
+            return jsonify({"msg": "parquet export is not available on this server"}), 501
+
+    cursor = rows(user_id, start, end)
+
+    def generate():
+        try:
+            yield from export_chunks(fmt, cursor, columns)
+        finally:
+            cursor.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{_filename(collection, fmt)}"'},
+    )
+
+
+# ---------- Background export jobs ----------
+def _run_job(app, job_id):
+    with app.app_context():
+        job = mongo.db.export_jobs.find_one_and_update(
+            {"_id": job_id, "status": "queued"}, {"$set": {"status": "running"}}
+        )
+        if not job:
+            return
+        columns, _, rows = EXPORTS[job["collection"]]
+        tmp = job["path"] + ".part"
+        cursor = None
+        try:
+            cursor = rows(job["user_id"], job.get("start"), job.get("end"))
+            mode = "wb" if job["format"] == "parquet" else "w"
+            with open(tmp, mode, **({} if mode == "wb" else {"newline": "", "encoding": "utf-8"})) as f:
+                for chunk in export_chunks(job["format"], cursor, columns):
+                    f.write(chunk)
+            os.replace(tmp, job["path"])
+            mongo.db.export_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "done", "size": os.path.getsize(job["path"]),
+                          "finished_at": datetime.now(timezone.utc)}},
+            )
+        except Exception as e:
+            # ✅ whatever fails (query, writer, disk), the job must not stay "running"
+            current_app.logger.exception("export job %s failed", job_id)
+            try:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            except OSError:
+                pass
+            mongo.db.export_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "failed", "error": str(e) or type(e).__name__,
+                          "finished_at": datetime.now(timezone.utc)}},
+            )
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+
+def _remove_expired_files(export_dir, ttl):
+    cutoff = time.time() - ttl
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _job_dict(job):
+    out = {
+        "id": str(job["_id"]),
+        "collection": job["collection"],
+        "format": job["format"],
+        "status": job["status"],
+        "created_at": job["created_at"].isoformat(),
+    }
+    if job["status"] == "done":
+        out["size"] = job.get("size")
+        out["download_url"] = f"/api/export/jobs/{job['_id']}/download"
+    if job["status"] == "failed":
+        out["error"] = job.get("error")
+    return out
+
+
+@export_bp.post("/api/export/<collection>")
+@jwt_required()
+def export_job(collection):
+    """
+    Same query args as GET; writes the file in the background and returns 202 with a job
+    to poll at GET /api/export/jobs/<id>.
+    """
+    global _executor
+    user_id = get_jwt_identity()
+    try:
+        fmt, start, end = _parse_request(collection)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    cfg = current_app.config
+    export_dir = cfg["EXPORT_DIR"]
+    os.makedirs(export_dir, exist_ok=True)
+    _remove_expired_files(export_dir, cfg["EXPORT_TTL"])
+
+    job_id = ObjectId()
+    job = {
+        "_id": job_id,
+        "user_id": user_id,
+        "collection": collection,
+        "format": fmt,
+        "start": start,
+        "end": end,
+        "status": "queued",
+        "path": os.path.join(export_dir, f"{job_id}.{fmt}"),
+        "created_at": datetime.now(timezone.utc),
+    }
+    mongo.db.export_jobs.insert_one(job)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=cfg["EXPORT_WORKERS"], thread_name_prefix="export")
+    _executor.submit(_run_job, current_app._get_current_object(), job_id)
+    return jsonify(_job_dict(job)), 202
+
+
+def _find_job(user_id, job_id):
+    if not ObjectId.is_valid(job_id):
+        return None
+    return mongo.db.export_jobs.find_one({"_id": ObjectId(job_id), "user_id": user_id})
+
+
+@export_bp.get("/api/export/jobs/<job_id>")
+@jwt_required()
+def export_job_status(job_id):
+    job = _find_job(get_jwt_identity(), job_id)
+    if not job:
+        return jsonify({"msg": "Not found"}), 404
+    return jsonify(_job_dict(job)), 200
+
+
+@export_bp.get("/api/export/jobs/<job_id>/download")
+@jwt_required()
+def export_job_download(job_id):
+    job = _find_job(get_jwt_identity(), job_id)
+    if not job or job["status"] != "done" or not os.path.exists(job["path"]):
+        return jsonify({"msg": "Not found"}), 404
+    return send_file(
+        job["path"],
+        mimetype=EXPORT_FORMATS[job["format"]],
+        as_attachment=True,
+        download_name=_filename(job["collection"], job["format"]),
+    )
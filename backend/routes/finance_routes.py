@@ -2,11 +2,14 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import mongo
+from models.version_model import bump_version
+from utils.http_cache import versioned
 
 finance_bp = Blueprint("finance_bp", __name__)
 
 @finance_bp.route("/api/finance", methods=["GET"])
 @jwt_required()
+@versioned("finance")
 def get_finance():
     user_id = get_jwt_identity()
     doc = mongo.db.finance.find_one({"user_id": user_id}) or {}
@@ -26,4 +29,5 @@ def save_finance():
         {"$set": data},
         upsert=True
     )
+    bump_version(user_id, "finance")
     return jsonify({"message": "Finance data saved"}), 200
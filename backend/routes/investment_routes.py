@@ -1,17 +1,39 @@
 # routes/investment_routes.py
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, current_app, request, jsonify
+from flask_jwt_extended import (
+    jwt_required, get_jwt, get_jwt_identity, get_jwt_request_location, create_access_token,
+)
 from database import mongo
-from datetime import datetime, timedelta
+from models.version_model import bump_version
+from utils.http_cache import versioned, cached
+from utils.idempotency import idempotent
+from utils.quote_cache import quote_cache
+from utils.price_hub import PriceHub
+from models.quote_model import (
+    market_open, tracked_symbols, save_quotes, read_quotes, claim_poll, quote_changes, quote_events,
+    quote_payload,
+)
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import json
 import math
+import os
+import queue
+import socket
+import time
 from nsetools import Nse
 import yfinance as yf
 import pandas as pd
 
 investment_bp = Blueprint("investment", __name__)
 
+# Portfolio P&L depends on live prices as well as positions, so keep it short-lived
+PORTFOLIO_CACHE_TTL = 30
+
+# `scope` claim of the short-lived tokens that open the price stream (and nothing else, see app.py)
+STREAM_SCOPE = "stream"
+
 # ---------- Helpers ----------
 
 def _to_float(v):
@@ -67,8 +89,8 @@ def _status_from(change):
 
 nse = Nse()
 
-def _intraday_quote(symbol: str):
-    # Try NSE first (without .NS suffix)
+def _nse_quote(symbol: str):
+    # NSE takes the bare symbol (without .NS suffix)
     try:
         if symbol.endswith(".NS"):
             base_symbol = symbol.replace(".NS", "")
@@ -89,6 +111,13 @@ def _intraday_quote(symbol: str):
                 }
     except Exception as e:
         print(f"NSE fetch failed for {symbol}: {e}")
+    return None
+
+def _intraday_quote(symbol: str):
+    # Try NSE first
+    q = _nse_quote(symbol)
+    if q:
+        return q
 
     # Fallback to yfinance if NSE fails
     import yfinance as yf
@@ -110,6 +139,171 @@ def _intraday_quote(symbol: str):
     except Exception as e:
         print(f"yfinance failed for {symbol}: {e}")
         return None
+
+def _download_quotes(symbols):
+    """
+    One multi-ticker yfinance download for all `symbols` -> {symbol: quote}.
+    Symbols with no rows are simply absent.
+    """
+    if not symbols:
+        return {}
+    try:
+        df = yf.download(symbols, period="1d", group_by="ticker", progress=False)
+    except Exception as e:
+        print(f"yfinance batch failed for {len(symbols)} symbols: {e}")
+        return {}
+    if df is None or df.empty:
+        return {}
+
+    out = {}
+    for symbol in symbols:
+        try:
+            frame = df[symbol] if isinstance(df.columns, pd.MultiIndex) else df
+            frame = frame.dropna(subset=["Close"])
+        except KeyError:
+            continue
+        if frame.empty:
+            continue
+        last = float(frame["Close"].iloc[-1])
+        opn = float(frame["Open"].iloc[0])
+        chg = last - opn
+        out[symbol] = {"symbol": symbol, "price": round(last, 2), "change": round(chg, 2), "status": _status_from(chg)}
+    return out
+
+def _batch_quotes(symbols):
+    """
+    Quotes for many symbols in one round trip: a multi-ticker download first, then NSE
+    only for the symbols it missed, then one more download of the .BO listing for
+    whatever is still missing. Keyed by the requested symbol.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    out = _download_quotes(symbols)
+    for symbol in symbols:
+        if symbol not in out:
+            q = _nse_quote(symbol)
+            if q:
+                out[symbol] = q
+    alts = {s.replace(".NS", ".BO"): s for s in symbols if s not in out and s.endswith(".NS")}
+    for alt, q in _download_quotes(list(alts)).items():
+        out[alts[alt]] = q
+    return out
+
+_quote_pool = None
+
+def _pool():
+    global _quote_pool
+    if _quote_pool is None:
+        _quote_pool = ThreadPoolExecutor(max_workers=current_app.config.get("QUOTE_POOL_SIZE", 8),
+                                         thread_name_prefix="quotes")
+    return _quote_pool
+
+def _refresh_chunk(chunk, fresh=False):
+    """
+    Fetch one chunk upstream and store it in `quotes`. `fresh` (the poller) bypasses the
+    in-memory cache; request-triggered fetches go through it so concurrent misses coalesce.
+    """
+    t0 = time.perf_counter()
+    if fresh:
+        got = _batch_quotes(chunk) if len(chunk) > 1 else {chunk[0]: _intraday_quote(chunk[0])}
+        for symbol in chunk:
+            quote_cache.put(symbol, got.get(symbol))
+        save_quotes(got, round((time.perf_counter() - t0) * 1000, 1))
+        return got
+    if len(chunk) == 1:
+        got = {chunk[0]: quote_cache.get(chunk[0], _intraday_quote)}
+    else:
+        got = quote_cache.get_many(chunk, _batch_quotes)
+    # ✅ a cache hit keeps the time it was really fetched, so staleness stays honest
+    fetched_at = {s: datetime.fromtimestamp(t, timezone.utc)
+                  for s in got if (t := quote_cache.fetched_at(s)) is not None}
+    save_quotes(got, round((time.perf_counter() - t0) * 1000, 1), fetched_at)
+    return got
+
+def refresh_quotes(symbols, fresh=False, timeout=None):
+    """
+    Fetch `symbols` into `quotes` in chunks of QUOTE_BATCH_SIZE on the QUOTE_POOL_SIZE pool,
+    waiting up to `timeout` seconds (None = until done). Chunks still running carry on in
+    the background. Returns the number of chunks finished.
+    """
+    size = max(1, current_app.config.get("QUOTE_BATCH_SIZE", 10))
+    symbols = list(dict.fromkeys(symbols))
+    futures = [_pool().submit(_refresh_chunk, symbols[i:i + size], fresh) for i in range(0, len(symbols), size)]
+    done, _ = wait(futures, timeout=timeout)
+    for fut in done:
+        if fut.exception():
+            print(f"Quote refresh failed: {fut.exception()}")
+    return len(done)
+
+def _poll_every(cfg):
+    return cfg.get("QUOTE_POLL_SECONDS", 15) if market_open() else cfg.get("QUOTE_POLL_AFTER_HOURS_SECONDS", 900)
+
+def poll_quotes(app):
+    """
+    Scheduler job (see app.py): refresh every tracked symbol into `quotes`. It ticks every
+    QUOTE_POLL_SECONDS, but only the worker holding the poller lease fetches, and after
+    market hours the lease runs QUOTE_POLL_AFTER_HOURS_SECONDS.
+    """
+    with app.app_context():
+        every = _poll_every(app.config)
+        # ✅ a second less than the cadence, so tick jitter doesn't skip every other round
+        if not claim_poll(f"{socket.gethostname()}:{os.getpid()}", max(1, every - 1)):
+            return
+        symbols = tracked_symbols()
+        if symbols:
+            refresh_quotes(symbols, fresh=True, timeout=every)
+
+def _quotes(symbols):
+    """
+    ({symbol: quote}, {symbol: ms this request spent getting it}) read from the `quotes`
+    collection. Quotes older than three poll intervals are marked stale/as_of and re-fetched
+    in the background (symbols nobody tracks aren't polled, so this is their only refresh).
+    A symbol with no quote yet is fetched the same way, waiting up to QUOTE_DEADLINE_MS for
+    it, and otherwise comes back as a price=None placeholder marked missing (timing None).
+    """
+    symbols = list(dict.fromkeys(symbols))
+    t0 = time.perf_counter()
+    docs = read_quotes(symbols)
+    read_ms = round((time.perf_counter() - t0) * 1000, 1)
+    unknown = [s for s in symbols if s not in docs]
+    fetch_ms = read_ms
+    if unknown:
+        deadline_ms = current_app.config.get("QUOTE_DEADLINE_MS", 2500)
+        refresh_quotes(unknown, timeout=deadline_ms / 1000)
+        docs.update(read_quotes(unknown))
+        fetch_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    stale_after = 3 * _poll_every(current_app.config)
+    now = datetime.now(timezone.utc)
+    quotes, timings, stale = {}, {}, []
+    for symbol in symbols:
+        d = docs.get(symbol)
+        if d is None:
+            quotes[symbol] = {"symbol": symbol, "price": None, "change": 0, "status": "flat", "missing": True}
+            timings[symbol] = None
+            continue
+        q = quote_payload(d)
+        fetched_at = d["fetched_at"] if d["fetched_at"].tzinfo else d["fetched_at"].replace(tzinfo=timezone.utc)
+        if (now - fetched_at).total_seconds() > stale_after:
+            q.update(stale=True, as_of=fetched_at.isoformat())
+            stale.append(symbol)
+        quotes[symbol] = q
+        timings[symbol] = fetch_ms if symbol in unknown else read_ms
+    if stale:
+        refresh_quotes(stale, timeout=0)
+    return quotes, timings
+
+def _with_quote_headers(resp, quotes, timings):
+    """
+    Server-Timing per symbol (what this request spent on it); partial answers (stale/missing)
+    are marked no-store so the response cache doesn't keep them.
+    """
+    resp.headers["Server-Timing"] = ", ".join(
+        f'quote;desc="{s}";dur={ms}' for s, ms in timings.items() if ms is not None
+    )
+    if any(q.get("stale") or q.get("missing") for q in quotes.values()):
+        resp.headers["Cache-Control"] = "no-store"
+    return resp
+
 def _history(symbol: str, range_key: str, interval: str):
     """
     Get history points for Chart.js.
@@ -156,17 +350,19 @@ def search_stocks():
 @jwt_required()
 def get_quote(symbol):
     try:
-        q = _intraday_quote(symbol)
-        if not q or not isinstance(q, dict) or "price" not in q:
+        quotes, timings = _quotes([symbol])
+        q = quotes.get(symbol)
+        if not q or not isinstance(q, dict) or q.get("price") is None:
             # Always return valid JSON so frontend never crashes
             return jsonify({
                 "symbol": symbol,
                 "price": None,
                 "change": 0,
                 "status": "flat",
-                "error": f"no_data_for_{symbol}"
+                "error": f"no_data_for_{symbol}",
+                **({"missing": True} if q and q.get("missing") else {}),
             }), 200
-        return jsonify(q), 200
+        return _with_quote_headers(jsonify(q), quotes, timings), 200
     except Exception as e:
         print(f"Quote error for {symbol}: {e}")
         return jsonify({
@@ -190,6 +386,7 @@ def get_history(symbol):
 
 @investment_bp.get("/api/invest/watchlist")
 @jwt_required()
+@versioned("watchlists")
 def get_watchlist():
     user_id = get_jwt_identity()
     doc = mongo.db.watchlists.find_one({"user_id": user_id})
@@ -212,6 +409,7 @@ def add_watchlist():
         },
         upsert=True,
     )
+    bump_version(user_id, "watchlists")
     return jsonify({"msg": "added"}), 201
 
 @investment_bp.delete("/api/invest/watchlist/<symbol>")
@@ -224,6 +422,7 @@ def remove_watchlist(symbol):
     )
     if res.modified_count == 0:
         return jsonify({"msg": "not_found"}), 404
+    bump_version(user_id, "watchlists")
     return jsonify({"msg": "removed"}), 200
 
 @investment_bp.get("/api/invest/watchlist/quotes")
@@ -231,19 +430,22 @@ def remove_watchlist(symbol):
 def watchlist_quotes():
     user_id = get_jwt_identity()
     doc = mongo.db.watchlists.find_one({"user_id": user_id}) or {"items": []}
+    items = doc.get("items", [])
+    quotes, timings = _quotes([it["symbol"] for it in items])
     out = []
-    for it in doc.get("items", []):
-        q = _intraday_quote(it["symbol"])
+    for it in items:
+        q = quotes.get(it["symbol"])
         if q:
             q["name"] = it.get("name", it["symbol"])
             out.append(q)
-    return jsonify(out)
+    return _with_quote_headers(jsonify(out), quotes, timings)
 
 # ---------- Portfolio positions (qty, avg_price) ----------
 
 # One doc per user_id; items: [{symbol, name, qty, avg_price}]
 @investment_bp.get("/api/invest/positions")
 @jwt_required()
+@versioned("positions")
 def get_positions():
     user_id = get_jwt_identity()
     doc = mongo.db.positions.find_one({"user_id": user_id})
@@ -251,6 +453,7 @@ def get_positions():
 
 @investment_bp.post("/api/invest/positions")
 @jwt_required()
+@idempotent
 def upsert_position():
     user_id = get_jwt_identity()
     body = request.get_json(force=True) or {}
@@ -277,6 +480,7 @@ def upsert_position():
             },
             upsert=True,
         )
+    bump_version(user_id, "positions")
     return jsonify({"msg": "upserted"}), 200
 
 @investment_bp.delete("/api/invest/positions/<symbol>")
@@ -289,19 +493,25 @@ def delete_position(symbol):
     )
     if res.modified_count == 0:
         return jsonify({"msg": "not_found"}), 404
+    bump_version(user_id, "positions")
     return jsonify({"msg": "removed"}), 200
 
 @investment_bp.get("/api/invest/portfolio/summary")
 @jwt_required()
+@cached("positions", ttl=PORTFOLIO_CACHE_TTL)
 def portfolio_summary():
     """
     Returns per-position P&L and overall aggregates:
-    { positions: [{symbol,name,qty,avg_price,ltp,mtm,invested,value,pl,pl_pct,status}], totals: {...} }
+    { positions: [{symbol,name,qty,avg_price,ltp,mtm,invested,value,pl,pl_pct,status}], totals: {...},
+      timings_ms: {symbol: ms this request spent getting the quote} }
+    Positions whose stored quote is old or not fetched yet carry stale/as_of or missing.
     """
     user_id = get_jwt_identity()
     doc = mongo.db.positions.find_one({"user_id": user_id}) or {"items": []}
     items = doc.get("items", [])
 
+    quotes, timings = _quotes([it["symbol"] for it in items
+                               if float(it.get("qty", 0)) > 0 and float(it.get("avg_price", 0)) > 0])
     positions = []
     total_invested = 0.0
     total_value = 0.0
@@ -314,8 +524,8 @@ def portfolio_summary():
         if qty <= 0 or avg_price <= 0:
             continue
 
-        q = _intraday_quote(symbol) or {"price": 0, "change": 0, "status": "flat"}
-        ltp = float(q["price"])
+        q = quotes.get(symbol) or {"price": 0, "change": 0, "status": "flat"}
+        ltp = float(q["price"] or 0)
         invested = qty * avg_price
         value = qty * ltp
         pl = value - invested
@@ -324,7 +534,8 @@ def portfolio_summary():
         positions.append({
             "symbol": symbol, "name": name, "qty": qty, "avg_price": round(avg_price, 2),
             "ltp": round(ltp, 2), "invested": round(invested, 2), "value": round(value, 2),
-            "pl": round(pl, 2), "pl_pct": round(pl_pct, 2), "status": q["status"]
+            "pl": round(pl, 2), "pl_pct": round(pl_pct, 2), "status": q["status"],
+            **{k: q[k] for k in ("stale", "as_of", "missing") if k in q},
         })
         total_invested += invested
         total_value += value
@@ -336,4 +547,95 @@ def portfolio_summary():
         "pl_pct": round(((total_value - total_invested) / total_invested * 100.0), 2) if total_invested > 0 else 0.0
     }
 
-    return jsonify({"positions": positions, "totals": totals})
+    return _with_quote_headers(jsonify({"positions": positions, "totals": totals, "timings_ms": timings}),
+                               quotes, timings)
+
+
+# ---------- Live prices (Server-Sent Events) ----------
+
+_hub = None
+
+def _price_hub():
+    global _hub
+    if _hub is None:
+        cfg = current_app.config
+        _hub = PriceHub(quote_changes, max_connections=cfg.get("SSE_MAX_CONNECTIONS", 100),
+                        interval=cfg.get("SSE_FEED_SECONDS", 1))
+    return _hub
+
+def _sse(event):
+    event_id, _, payload = event
+    return f"id: {event_id}\nevent: price\ndata: {json.dumps(payload)}\n\n"
+
+@investment_bp.post("/api/invest/stream/token")
+@jwt_required()
+def stream_token():
+    """
+    A token good for SSE_TOKEN_SECONDS that only opens /api/invest/stream. EventSource can't
+    set headers, so this is what goes in the stream URL instead of the login token.
+    """
+    seconds = current_app.config.get("SSE_TOKEN_SECONDS", 60)
+    token = create_access_token(identity=get_jwt_identity(), expires_delta=timedelta(seconds=seconds),
+                                additional_claims={"scope": STREAM_SCOPE})
+    return jsonify({"token": token, "expires_in": seconds}), 200
+
+@investment_bp.get("/api/invest/stream")
+@jwt_required(locations=["headers", "query_string"])
+def price_stream():
+    """
+    text/event-stream of `price` events ({symbol, price, change, status}) for the symbols in
+    the caller's watchlist and positions as of connecting. EventSource can't set headers,
+    so a stream token (POST /api/invest/stream/token) may come as ?jwt=. Sends the current
+    quotes first (or, on reconnect, only what changed after Last-Event-ID / last_event_id),
+    then each change as the hub sees it, with a comment line every SSE_HEARTBEAT_SECONDS.
+    Each stream holds a thread, so run gthread workers (gunicorn.conf.py); the response ends
+    after SSE_MAX_STREAM_SECONDS and the client reconnects and resumes.
+    503 once the worker holds SSE_MAX_CONNECTIONS.
+    """
+    if get_jwt_request_location() == "query_string" and get_jwt().get("scope") != STREAM_SCOPE:
+        # URLs end up in access logs and browser history; keep long-lived tokens out of them
+        return jsonify({"msg": "use a stream token from POST /api/invest/stream/token in the URL"}), 401
+    user_id = get_jwt_identity()
+    symbols = set()
+    for coll in ("watchlists", "positions"):
+        doc = mongo.db[coll].find_one({"user_id": user_id}, {"items.symbol": 1}) or {}
+        symbols.update(it["symbol"] for it in doc.get("items", []))
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    since = int(last_id) if last_id and last_id.isdigit() else None
+
+    hub = _price_hub()
+    sub = hub.subscribe(symbols)
+    if sub is None:
+        return jsonify({"msg": "too many live connections, try again shortly"}), 503, {"Retry-After": "30"}
+    # ✅ subscribed before reading the backlog, so nothing falls between the two; `sent` drops repeats
+    backlog = quote_events(symbols, since) if symbols else []
+    heartbeat = current_app.config.get("SSE_HEARTBEAT_SECONDS", 15)
+    deadline = time.monotonic() + current_app.config.get("SSE_MAX_STREAM_SECONDS", 25)
+
+    def generate():
+        sent = {}
+        try:
+            yield "retry: 5000\n\n"
+            for event in backlog:
+                sent[event[1]] = event[0]
+                yield _sse(event)
+            while not sub.closed:
+                left = deadline - time.monotonic()
+                # ✅ stop only with the queue drained: one poll's events share an id and resume is strictly after it
+                if left <= 0 and sub.queue.empty():
+                    break
+                try:
+                    event = sub.queue.get(timeout=max(0.01, min(heartbeat, left)))
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if sent.get(event[1], -1) >= event[0]:
+                    continue
+                sent[event[1]] = event[0]
+                yield _sse(event)
+        finally:
+            hub.unsubscribe(sub)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -33,6 +33,15 @@ def notify_goal_exceeded():
     if not all([category, spent, goal, email]):
         return jsonify({"error": "Missing data"}), 400
 
+    try:
+        send_goal_alert(email, category, spent, goal)
+        return jsonify({"message": "Email sent successfully"}), 200
+    except Exception as e:
+        print("❌ Email sending error:", e, flush=True)
+        return jsonify({"error": "Failed to send email"}), 500
+
+
+def send_goal_alert(email, category, spent, goal):
     subject = f"Budget Alert: {category} Exceeded!"
     body = (
         f"Hi there,\n\n"
@@ -42,13 +51,7 @@ def notify_goal_exceeded():
         f"Please review your expenses.\n\n"
         f"— Expense Tracker"
     )
-
-    try:
-        send_email(email, subject, body)
-        return jsonify({"message": "Email sent successfully"}), 200
-    except Exception as e:
-        print("❌ Email sending error:", e, flush=True)
-        return jsonify({"error": "Failed to send email"}), 500
+    send_email(email, subject, body)
 
 
 def send_email(to_email, subject, body):
@@ -0,0 +1,74 @@
+# routes/sync_routes.py
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime, timedelta, timezone
+from database import TOMBSTONE_TTL
+from models.sync_model import SYNC_COLLECTIONS, changed_since, deleted_since
+from models.recurring_model import materialize_due
+from routes.expense_routes import _as_dict as _expense_dict
+from routes.emi_routes import _as_dict as _emi_dict, _as_loan_dict
+
+sync_bp = Blueprint("sync_bp", __name__)
+
+# Writes stamp updated_at just before they commit, so re-read a short window
+# behind the token to catch ones that landed after the previous sync ran.
+SYNC_OVERLAP = timedelta(seconds=5)
+SYNC_MAX_CHANGES = 5000
+
+_SERIALIZERS = {"expenses": _expense_dict, "emis": _emi_dict, "loans": _as_loan_dict}
+
+
+def _encode_token(dt: datetime):
+    return str(int(dt.timestamp() * 1000))
+
+
+def _decode_token(token: str):
+    try:
+        return datetime.fromtimestamp(int(token) / 1000, tz=timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        raise ValueError("invalid sync token")
+
+
+@sync_bp.get("/api/sync")
+@jwt_required()
+def sync():
+    """
+    GET /api/sync?since=<token>
+    Returns {token, reset, expenses|emis|loans: {upserted: [...], deleted: [ids]}}.
+    Without `since` (or when reset is true) the upserted lists hold everything.
+    """
+    user_id = get_jwt_identity()
+    materialize_due(user_id)  # ✅ recurring occurrences up to now are part of the change feed
+    now = datetime.now(timezone.utc)
+    since = None
+    if request.args.get("since"):
+        try:
+            since = _decode_token(request.args["since"])
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+    # Tombstones older than the TTL are gone, so a stale token can't be answered incrementally
+    if since is not None and since < now - TOMBSTONE_TTL + SYNC_OVERLAP:
+        since = None
+    window = since - SYNC_OVERLAP if since is not None else None
+
+    changes = {}
+    if window is not None:
+        for coll in SYNC_COLLECTIONS:
+            rows = changed_since(user_id, coll, window, SYNC_MAX_CHANGES)
+            if len(rows) > SYNC_MAX_CHANGES:
+                # too far behind for a delta to be cheaper than a full reload
+                window = None
+                break
+            changes[coll] = rows
+    if window is None:
+        changes = {coll: changed_since(user_id, coll, None) for coll in SYNC_COLLECTIONS}
+
+    out = {"token": _encode_token(now), "reset": window is None}
+    for coll in SYNC_COLLECTIONS:
+        serialize = _SERIALIZERS[coll]
+        out[coll] = {
+            "upserted": [serialize(x) for x in changes[coll]],
+            "deleted": deleted_since(user_id, coll, window) if window is not None else [],
+        }
+    return jsonify(out), 200
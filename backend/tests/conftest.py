@@ -0,0 +1,18 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def db():
+    """
+    A fresh in-memory database behind `mongo.db`.
+    """
+    from database import mongo
+
+    mongo.db = mongomock.MongoClient(tz_aware=False).db
+    yield mongo.db
@@ -0,0 +1,28 @@
+from bson import ObjectId
+
+from models.expense_schema import migrate_expenses_v2
+
+USER = "65a000000000000000000001"
+
+
+def test_migration_skips_unusable_amounts(db):
+    db.expenses.insert_many([
+        {"user_id": USER, "amount": 12.5, "category": "Food"},
+        {"user_id": USER, "amount": None, "category": "Food"},
+        {"user_id": USER, "amount": "abc", "category": "Food"},
+        {"user_id": USER, "category": "Food"},
+    ])
+    logged = []
+
+    assert migrate_expenses_v2(batch_size=2, log=logged.append) == 2
+
+    docs = list(db.expenses.find({}, {"_id": 0, "category": 0}).sort("_id", 1))
+    uid = ObjectId(USER)
+    assert docs == [
+        {"user_id": uid, "paise": 1250},
+        {"user_id": uid, "amount": None, "amount_invalid": True},
+        {"user_id": uid, "amount": "abc", "amount_invalid": True},
+        {"user_id": uid},
+    ]
+    assert db.migrations.find_one({"_id": "expenses_v2"})["done"] is True
+    assert any("skipped 2 expenses" in line for line in logged)
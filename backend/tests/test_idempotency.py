@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+
+import utils.idempotency as idempotency
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(idempotency, "_hot", idempotency.MemoryBackend(16))
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY="k" * 32, IDEMPOTENCY_LEASE=60)
+    JWTManager(app)
+    runs = []
+
+    @app.post("/things")
+    @jwt_required()
+    @idempotency.idempotent
+    def make_thing():
+        runs.append(1)
+        return jsonify({"n": len(runs)}), 201
+
+    with app.app_context():
+        token = create_access_token(identity="u1")
+    c = app.test_client()
+    c.headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "k1"}
+    c.runs = runs
+    return c
+
+
+def _post(client):
+    return client.post("/things", json={"x": 1}, headers=client.headers)
+
+
+def test_live_claim_is_409_and_expired_claim_is_taken_over(client, db):
+    assert _post(client).status_code == 201
+    # pretend the first run died before storing its response
+    db.idempotency_keys.update_many({}, {"$set": {"status": None, "lease_until": datetime.now(timezone.utc) + timedelta(seconds=30)}})
+    idempotency._hot.clear()
+    assert _post(client).status_code == 409
+
+    db.idempotency_keys.update_many({}, {"$set": {"lease_until": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+    retried = _post(client)
+    assert retried.status_code == 201 and retried.get_json() == {"n": 2}
+
+    replay = _post(client)
+    assert replay.headers.get("Idempotent-Replayed") == "true" and replay.get_json() == {"n": 2}
+    assert len(client.runs) == 2
@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+
+from models.recurring_model import catch_up, create_rule, occurrences
+from models.expense_model import get_expenses
+from models.rollup_model import rollup_summary_by_category
+
+USER = "65a000000000000000000001"
+
+
+def _rent_total(user_id):
+    return {r["category"]: r["total"] for r in rollup_summary_by_category(user_id)}.get("Rent")
+
+
+def test_far_future_read_only_expands_the_requested_range(db):
+    start = datetime(2024, 1, 31, tzinfo=timezone.utc)
+    rule = create_rule(USER, "Rent", 1000, "flat", "monthly", 1, start)
+    past = len(occurrences(rule, start, datetime.now(timezone.utc)))
+
+    assert len(get_expenses(USER)) == past
+
+    jan_2030 = get_expenses(USER, datetime(2030, 1, 1, tzinfo=timezone.utc),
+                            datetime(2030, 1, 31, 23, 59, 59, tzinfo=timezone.utc))
+    assert [e["created_at"].date().isoformat() for e in jan_2030] == ["2030-01-31"]
+
+    # nothing between now and 2030 was written, and re-reading writes nothing new
+    assert db.expenses.count_documents({}) == past + 1
+    assert _rent_total(USER) == (past + 1) * 1000
+    assert len(get_expenses(USER)) == past + 1
+    assert db.expenses.count_documents({}) == past + 1
+
+
+def test_repeat_reads_leave_the_rule_alone(db, monkeypatch):
+    create_rule(USER, "Gym", 50, "", "weekly", 1, datetime(2025, 1, 6, tzinfo=timezone.utc))
+    get_expenses(USER)
+    written = db.expenses.count_documents({})
+
+    rule_writes = []
+    collection = type(db.recurring_rules)
+    update_one = collection.update_one
+    monkeypatch.setattr(collection, "update_one",
+                        lambda self, *a, **k: rule_writes.append(a) or update_one(self, *a, **k))
+
+    for _ in range(3):
+        get_expenses(USER)
+        catch_up(USER)
+    get_expenses(USER, datetime(2025, 3, 1, tzinfo=timezone.utc), datetime(2025, 3, 31, tzinfo=timezone.utc))
+    get_expenses(USER, datetime(2025, 3, 2, tzinfo=timezone.utc), datetime(2025, 3, 30, tzinfo=timezone.utc))
+
+    assert rule_writes == []
+    assert db.expenses.count_documents({}) == written
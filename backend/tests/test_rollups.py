@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+
+from models.expense_model import add_expense
+from models.rollup_model import rollup_spend_over_time, whole_days
+
+USER = "65a000000000000000000001"
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_series_buckets_by_the_default_zone_day(db):
+    add_expense(USER, "Food", 100, date="2026-01-04T18:29:00Z")  # 23:59 IST, Sun 4 Jan
+    add_expense(USER, "Food", 200, date="2026-01-04T18:30:00Z")  # 00:00 IST, Mon 5 Jan
+    add_expense(USER, "Travel", 50, date="2026-01-31T20:00:00Z")  # 1 Feb IST
+
+    days = rollup_spend_over_time(USER, "day")
+    assert [(r["period"], r["total"]) for r in days] == [
+        ("2026-01-04", 100.0), ("2026-01-05", 200.0), ("2026-02-01", 50.0),
+    ]
+    assert days[1]["start"] == datetime(2026, 1, 4, 18, 30)
+
+    weeks = rollup_spend_over_time(USER, "week")
+    assert [(r["period"], r["total"]) for r in weeks] == [("2026-W01", 100.0), ("2026-W02", 200.0), ("2026-W05", 50.0)]
+
+    # January in IST, as the frontend asks for it
+    jan = (_utc(2025, 12, 31, 18, 30), _utc(2026, 1, 31, 18, 29, 59, 999000))
+    assert whole_days(*jan) is not None
+    assert [(r["period"], r["total"]) for r in rollup_spend_over_time(USER, "month", *jan)] == [("2026-01", 300.0)]
+    assert whole_days(_utc(2026, 1, 1), None) is None
@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """
+    In-process LRU with a per-entry TTL. Thread-safe; one instance per worker.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: int):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """
+    Shared cache across workers. `client` is anything with redis-py's get/setex/scan_iter/delete.
+    """
+
+    def __init__(self, client, prefix: str = "et:cache:"):
+        self.client = client
+        self.prefix = prefix
+        self.evictions = 0  # Redis evicts on its own; not observable here
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl: int):
+        self.client.setex(self.prefix + key, ttl, json.dumps(value))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(self.prefix + "*"))
+
+
+class FakeRedis:
+    """
+    Minimal local stand-in for a Redis client (get/setex/scan_iter/delete), for
+    running the shared backend without a Redis server.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def setex(self, key, ttl, value):
+        with self._lock:
+            self._data[key] = (value.encode("utf-8") if isinstance(value, str) else value,
+                               time.monotonic() + ttl)
+
+    def scan_iter(self, pattern="*"):
+        prefix = pattern.rstrip("*")
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(prefix)]
+        return iter(keys)
+
+    def delete(self, *keys):
+        with self._lock:
+            for k in keys:
+                self._data.pop(k, None)
+
+
+class ResponseCache:
+    """
+    Front for whichever backend is configured, with hit/miss counters for sizing.
+    """
+
+    def __init__(self, backend=None, default_ttl: int = 300):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl or self.default_ttl)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.backend.evictions,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def init_cache(app):
+    """
+    Configure `response_cache` from CACHE_BACKEND = memory | redis | fake.
+    """
+    kind = app.config.get("CACHE_BACKEND", "memory")
+    if kind == "redis":
+        import redis  # optional dependency, only needed for the shared backend
+        backend = RedisBackend(redis.Redis.from_url(app.config["CACHE_REDIS_URL"]))
+    elif kind == "fake":
+        backend = RedisBackend(FakeRedis())
+    else:
+        backend = MemoryBackend(app.config.get("CACHE_MAX_ENTRIES", 2048))
+    response_cache.backend = backend
+    response_cache.default_ttl = app.config.get("CACHE_DEFAULT_TTL", 300)
+    response_cache.hits = response_cache.misses = 0
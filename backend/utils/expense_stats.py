@@ -0,0 +1,109 @@
+import numpy as np
+
+DAY_MS = 86_400_000
+DEFAULT_WINDOW_DAYS = 30
+DEFAULT_Z_THRESHOLD = 3.0
+MAX_OUTLIERS = 20
+
+
+def _months(ts_ms: np.ndarray, offset_ms: int):
+    """
+    Calendar month of each timestamp (shifted into the caller's timezone) as datetime64[M].
+    """
+    return (ts_ms + offset_ms).astype("datetime64[ms]").astype("datetime64[M]")
+
+
+def category_stats(category: str, ids: list, paise: np.ndarray, ts: np.ndarray, end_ms: int,
+                   window_days: int = DEFAULT_WINDOW_DAYS, z_threshold: float = DEFAULT_Z_THRESHOLD):
+    """
+    Distribution, recent pace and outliers for one category. `paise`/`ts` are int64
+    arrays in time order; everything below is a whole-array NumPy operation.
+    """
+    amounts = paise / 100.0
+    mean = float(amounts.mean())
+    std = float(amounts.std())
+    median, p90 = np.percentile(amounts, [50, 90])
+
+    # ✅ trailing window: average spend per day over the last `window_days` of the range
+    recent = ts > end_ms - window_days * DAY_MS
+    rolling_mean = float(amounts[recent].sum()) / window_days
+
+    outliers = []
+    if std > 0:
+        z = (amounts - mean) / std
+        hits = np.flatnonzero(np.abs(z) >= z_threshold)
+        hits = hits[np.argsort(-np.abs(z[hits]))][:MAX_OUTLIERS]
+        outliers = [{
+            "id": str(ids[i]),
+            "amount": float(amounts[i]),
+            "created_at": np.datetime64(int(ts[i]), "ms").astype(str) + "Z",
+            "z": round(float(z[i]), 2),
+        } for i in hits]
+
+    return {
+        "category": category,
+        "count": int(amounts.size),
+        "total": int(paise.sum()) / 100,
+        "mean": round(mean, 2),
+        "median": round(float(median), 2),
+        "p90": round(float(p90), 2),
+        "std": round(std, 2),
+        "rolling_mean": round(rolling_mean, 2),
+        "outliers": outliers,
+    }
+
+
+def monthly_deltas(paise: np.ndarray, ts: np.ndarray, offset_ms: int = 0):
+    """
+    Total per calendar month with the change from the previous month (months with
+    no spend in between count as zero).
+    """
+    if paise.size == 0:
+        return []
+    months = _months(ts, offset_ms)
+    first, last = months.min(), months.max()
+    idx = (months - first).astype(np.int64)
+    totals = np.bincount(idx, weights=paise, minlength=int((last - first).astype(np.int64)) + 1)
+    deltas = np.diff(totals, prepend=np.nan)
+    prev = np.concatenate(([np.nan], totals[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(prev > 0, deltas / prev * 100, np.nan)
+
+    labels = np.arange(first, last + 1).astype(str)
+    return [{
+        "month": str(labels[i]),
+        "total": float(totals[i]) / 100,
+        "delta": None if np.isnan(deltas[i]) else float(deltas[i]) / 100,
+        "pct_change": None if np.isnan(pct[i]) else round(float(pct[i]), 1),
+    } for i in range(totals.size)]
+
+
+def spending_stats(columns: dict, end_ms: int, offset_ms: int = 0,
+                   window_days: int = DEFAULT_WINDOW_DAYS, z_threshold: float = DEFAULT_Z_THRESHOLD):
+    """
+    `columns` is expense_columns() output. Returns per-category stats plus
+    month-over-month totals (overall and per category).
+    """
+    categories = []
+    all_paise, all_ts = [], []
+    by_category_months = {}
+    for category, col in columns.items():
+        paise = np.asarray(col["paise"], dtype=np.int64)
+        ts = np.asarray(col["ts"], dtype=np.int64)
+        if paise.size == 0:
+            continue
+        categories.append(category_stats(category, col["ids"], paise, ts, end_ms, window_days, z_threshold))
+        by_category_months[category] = monthly_deltas(paise, ts, offset_ms)
+        all_paise.append(paise)
+        all_ts.append(ts)
+
+    categories.sort(key=lambda c: c["total"], reverse=True)
+    paise = np.concatenate(all_paise) if all_paise else np.empty(0, dtype=np.int64)
+    ts = np.concatenate(all_ts) if all_ts else np.empty(0, dtype=np.int64)
+    return {
+        "count": int(paise.size),
+        "total": int(paise.sum()) / 100,
+        "categories": categories,
+        "monthly": monthly_deltas(paise, ts, offset_ms),
+        "monthly_by_category": by_category_months,
+    }
@@ -0,0 +1,111 @@
+import csv
+import io
+from datetime import datetime
+
+# A column is (name, type, getter) with type one of: string | float | int | timestamp.
+# Rows come straight off a cursor; both writers hold at most one chunk / row group.
+
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+CSV_CHUNK_ROWS = 1000
+PARQUET_ROW_GROUP = 10000
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(rows, columns, chunk_rows: int = CSV_CHUNK_ROWS):
+    """
+    Yield the export as CSV text, one chunk per `chunk_rows` rows.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _, _ in columns])
+    n = 0
+    for row in rows:
+        writer.writerow([_csv_value(get(row)) for _, _, get in columns])
+        n += 1
+        if n % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+class _ChunkSink:
+    """
+    Write-only file object that hands bytes back to the generator instead of a disk.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.pos = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        out, self.chunks = b"".join(self.chunks), []
+        return out
+
+
+def parquet_chunks(rows, columns, row_group_size: int = PARQUET_ROW_GROUP):
+    """
+    Yield the export as Parquet bytes, one row group at a time (footer last).
+    Needs pyarrow; raises RuntimeError when it isn't installed.
+    """
+    try:
+        import pyarrow as pa  # optional dependency, only needed for Parquet export
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("parquet export needs pyarrow installed")
+
+    types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64(),
+             "timestamp": pa.timestamp("ms", tz="UTC")}
+    schema = pa.schema([(name, types[kind]) for name, kind, _ in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    def flush(batch):
+        writer.write_table(pa.Table.from_pydict(
+            {name: col for (name, _, _), col in zip(columns, batch)}, schema=schema
+        ))
+        return sink.drain()
+
+    batch = [[] for _ in columns]
+    n = 0
+    try:
+        for row in rows:
+            for col, (_, _, get) in zip(batch, columns):
+                col.append(get(row))
+            n += 1
+            if n % row_group_size == 0:
+                yield flush(batch)
+                batch = [[] for _ in columns]
+        if n % row_group_size or n == 0:
+            yield flush(batch)
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_chunks(fmt: str, rows, columns):
+    if fmt == "parquet":
+        return parquet_chunks(rows, columns)
+    return csv_chunks(rows, columns)
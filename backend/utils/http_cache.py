@@ -0,0 +1,84 @@
+import hashlib
+from functools import wraps
+from flask import g, request, make_response, jsonify
+from flask_jwt_extended import get_jwt_identity
+from models.version_model import get_version
+from utils.cache import response_cache
+
+
+def _current_version(user_id: str, collection: str):
+    """
+    Version lookup memoised per request, so @versioned and @cached share one read.
+    """
+    seen = g.setdefault("data_versions", {})
+    if collection not in seen:
+        seen[collection] = get_version(user_id, collection)
+    return seen[collection]
+
+
+def versioned(collection: str, refresh=None, vary=None):
+    """
+    ETag / If-None-Match for a GET endpoint whose body depends only on the
+    caller's `collection` data and the query string. Use under @jwt_required().
+    A matching If-None-Match is answered with 304 before the view runs.
+    `refresh(user_id)`, if given, brings time-dependent data up to date before a full
+    response; it returns how much it wrote. A 304 skips it (the scheduler's catch-up job
+    bumps the version when something falls due), so revalidating stays one version lookup.
+    `vary()`, if given, returns anything else the body depends on (e.g. today's date).
+    """
+    def decorator(fn):
+        def etag_for(user_id):
+            # ✅ read the version *before* the query: a concurrent write can only make the tag older, never newer
+            version = _current_version(user_id, collection)
+            scope = hashlib.sha1(
+                f"{user_id}|{request.path}|{request.query_string.decode('latin-1')}|{request.accept_mimetypes}|{vary() if vary else ''}".encode("utf-8")
+            ).hexdigest()[:16]
+            return f"{collection}-{version}-{scope}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            etag = etag_for(user_id)
+
+            if request.if_none_match.contains_weak(etag):
+                resp = make_response("", 304)
+            else:
+                if refresh is not None and refresh(user_id):
+                    g.data_versions.pop(collection, None)
+                    etag = etag_for(user_id)
+                resp = make_response(fn(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag, weak=True)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+        return wrapper
+    return decorator
+
+
+def cached(collection: str, ttl: int = None, vary=None):
+    """
+    Cache a JSON GET response per user and normalised query args. The key embeds the
+    caller's `collection` version, so any write that bumps it makes old entries
+    unreachable (they age out by TTL/LRU) — on every worker, whatever the backend.
+    Use under @jwt_required(). A response sent with Cache-Control: no-store isn't kept.
+    `vary()` works as in @versioned.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            user_id = get_jwt_identity()
+            version = _current_version(user_id, collection)
+            params = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+            key = f"{fn.__name__}|{user_id}|{collection}:{version}|{sorted(kwargs.items())}|{params}|{vary() if vary else ''}"
+
+            hit = response_cache.get(key)
+            if hit is not None:
+                return jsonify(hit), 200
+
+            resp = make_response(fn(*args, **kwargs))
+            if resp.status_code == 200 and resp.is_json and "no-store" not in resp.headers.get("Cache-Control", ""):
+                response_cache.set(key, resp.get_json(), ttl)
+            return resp
+        return wrapper
+    return decorator
@@ -0,0 +1,116 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import current_app, request, jsonify, make_response
+from flask_jwt_extended import get_jwt_identity
+from pymongo.errors import DuplicateKeyError
+from database import mongo
+from utils.cache import MemoryBackend
+
+# Stored results live in `idempotency_keys` ({_id: scope hash, fingerprint, status, body, ...},
+# expired by a TTL index on created_at, see database.py) with recent ones also held in
+# process memory, so a retry usually doesn't reach Mongo at all.
+# A request in progress holds {status: None, claim, claimed_at, lease_until}; if its worker
+# dies the lease runs out and the next retry takes the key over instead of getting 409 for a day.
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+HOT_TTL = 600  # seconds a result stays in the in-memory layer
+
+_hot = MemoryBackend(max_entries=4096)
+
+
+def _lease():
+    now = datetime.now(timezone.utc)
+    return now, {
+        "claim": uuid.uuid4().hex,
+        "claimed_at": now,
+        "lease_until": now + timedelta(seconds=current_app.config.get("IDEMPOTENCY_LEASE", 60)),
+    }
+
+
+def _take_over(scope: str, fingerprint: str):
+    """
+    Claim an unfinished key whose lease has run out. Compare-and-set on the expired
+    lease, so of several concurrent retries only one gets it. The new claim, or None.
+    """
+    now, lease = _lease()
+    taken = mongo.db.idempotency_keys.find_one_and_update(
+        {"_id": scope, "status": None, "fingerprint": fingerprint, "lease_until": {"$lt": now}},
+        {"$set": lease},
+    )
+    return lease["claim"] if taken is not None else None
+
+
+def _replay(saved):
+    resp = make_response(saved["body"], saved["status"])
+    resp.headers["Content-Type"] = saved["content_type"]
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def idempotent(fn):
+    """
+    Honour an Idempotency-Key header on a POST: the first request with a key runs and
+    its response is stored; retries with the same key (same user, path and body) get
+    that response back without running the view again. Use under @jwt_required().
+    Without the header the view runs as usual.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"msg": f"{IDEMPOTENCY_HEADER} is too long"}), 400
+
+        user_id = get_jwt_identity()
+        scope = hashlib.sha1(f"{user_id}|{request.method}|{request.path}|{key}".encode("utf-8")).hexdigest()
+        fingerprint = hashlib.sha1(request.get_data()).hexdigest()
+
+        saved = _hot.get(scope)
+        if saved is None:
+            saved = mongo.db.idempotency_keys.find_one({"_id": scope})  # ✅ one _id lookup
+        if saved is not None:
+            if saved["fingerprint"] != fingerprint:
+                return jsonify({"msg": f"{IDEMPOTENCY_HEADER} was already used with a different body"}), 422
+            if saved["status"] is not None:
+                _hot.set(scope, saved, HOT_TTL)
+                return _replay(saved)
+            claim = _take_over(scope, fingerprint)
+            if claim is None:
+                return jsonify({"msg": "a request with this key is still in progress"}), 409
+        else:
+            # claim the key before running, so two concurrent retries can't both write
+            now, lease = _lease()
+            claim = lease["claim"]
+            try:
+                mongo.db.idempotency_keys.insert_one({
+                    "_id": scope, "fingerprint": fingerprint, "status": None, "created_at": now, **lease,
+                })
+            except DuplicateKeyError:
+                return jsonify({"msg": "a request with this key is still in progress"}), 409
+
+        # writes below only touch our own claim, in case a slow run was taken over meanwhile
+        mine = {"_id": scope, "claim": claim}
+        try:
+            resp = make_response(fn(*args, **kwargs))
+        except Exception:
+            mongo.db.idempotency_keys.delete_one(mine)
+            raise
+        if resp.status_code >= 500:
+            # a server error isn't a result worth replaying; let the client retry for real
+            mongo.db.idempotency_keys.delete_one(mine)
+            return resp
+
+        saved = {
+            "fingerprint": fingerprint,
+            "status": resp.status_code,
+            "body": resp.get_data(as_text=True),
+            "content_type": resp.headers.get("Content-Type", "application/json"),
+        }
+        mongo.db.idempotency_keys.update_one(mine, {"$set": saved})
+        _hot.set(scope, saved, HOT_TTL)
+        return resp
+    return wrapper
@@ -0,0 +1,46 @@
+import base64
+import json
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def parse_limit(val, default: int = DEFAULT_PAGE_SIZE):
+    """
+    Clamp a ?limit= query arg into [1, MAX_PAGE_SIZE].
+    """
+    if val in (None, ""):
+        return default
+    try:
+        n = int(val)
+    except Exception:
+        raise ValueError("invalid limit")
+    if n <= 0:
+        raise ValueError("invalid limit")
+    return min(n, MAX_PAGE_SIZE)
+
+
+def encode_cursor(created_at: datetime, oid: ObjectId) -> str:
+    """
+    Build an opaque ``next`` token from the last row's (created_at, _id).
+    """
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    raw = json.dumps({"t": created_at.isoformat(), "id": str(oid)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str):
+    """
+    Inverse of ``encode_cursor``. Returns (created_at, ObjectId) in UTC.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        created_at = datetime.fromisoformat(data["t"]).replace(tzinfo=timezone.utc)
+        return created_at, ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError("invalid cursor")
@@ -0,0 +1,89 @@
+import queue
+import threading
+import time
+
+# In-process fan-out of quote changes to Server-Sent Events connections.
+# One feed thread per worker reads recent changes with `fetch_changes(since_ms)` and
+# hands each event to the subscribers watching that symbol, so a worker's upstream
+# cost is one cheap query per tick however many clients are connected.
+# An event is (id, symbol, payload) where id is the change time in epoch ms.
+
+
+class Subscription:
+    def __init__(self, symbols, queue_size: int):
+        self.symbols = frozenset(symbols)
+        self.queue = queue.Queue(queue_size)
+        self.closed = False
+
+
+class PriceHub:
+    """
+    Subscribers register for a set of symbols and read events off their own queue.
+    A subscriber that falls `queue_size` events behind is closed; its client reconnects
+    with Last-Event-ID and catches up from the database.
+    """
+
+    def __init__(self, fetch_changes, max_connections: int = 100, interval: float = 1.0,
+                 lookback: float = 5.0, queue_size: int = 256):
+        self.fetch_changes = fetch_changes
+        self.max_connections = max_connections
+        self.interval = interval
+        self.lookback_ms = int(lookback * 1000)  # re-read window, covers writes that land out of order
+        self.queue_size = queue_size
+        self._subs = set()
+        self._last = {}  # symbol -> id of the last event published
+        self._lock = threading.Lock()
+        self._feed = None
+
+    def subscribe(self, symbols):
+        """
+        A new Subscription, or None when the worker is at max_connections.
+        """
+        with self._lock:
+            if len(self._subs) >= self.max_connections:
+                return None
+            sub = Subscription(symbols, self.queue_size)
+            self._subs.add(sub)
+            if self._feed is None:
+                self._feed = threading.Thread(target=self._run, name="price-hub", daemon=True)
+                self._feed.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        sub.closed = True
+        with self._lock:
+            self._subs.discard(sub)
+
+    def publish(self, events):
+        with self._lock:
+            subs = list(self._subs)
+            fresh = []
+            for event in events:
+                event_id, symbol, _ = event
+                if self._last.get(symbol, -1) >= event_id:
+                    continue
+                self._last[symbol] = event_id
+                fresh.append(event)
+
+        for event in fresh:
+            for sub in subs:
+                if sub.closed or event[1] not in sub.symbols:
+                    continue
+                try:
+                    sub.queue.put_nowait(event)
+                except queue.Full:
+                    sub.closed = True
+
+    def connections(self):
+        return len(self._subs)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._subs:
+                continue
+            since_ms = int(time.time() * 1000) - self.lookback_ms
+            try:
+                self.publish(self.fetch_changes(since_ms))
+            except Exception as e:
+                print(f"Price feed failed: {e}")
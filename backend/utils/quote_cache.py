@@ -0,0 +1,149 @@
+import threading
+import time
+from utils.cache import MemoryBackend
+
+# Per-symbol quote cache shared by every request in the worker. Upstream calls go
+# through get(symbol, fetch): a hit returns straight from memory, and concurrent
+# misses for one symbol wait on a single fetch instead of each calling NSE/Yahoo.
+# get_many(symbols, fetch_many) does the same for a list, fetching all misses in one call.
+
+
+def _copy(quote):
+    # callers decorate the dicts they get back (e.g. add "name"), so never hand out the cached one
+    return dict(quote) if quote else None
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class QuoteCache:
+    """
+    TTL cache of quote dicts keyed by symbol, with single-flight misses.
+    Failed lookups (None) are kept for `miss_ttl` so a dead symbol isn't retried on every request.
+    """
+
+    def __init__(self, ttl: int = 15, miss_ttl: int = 5, max_entries: int = 4096):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._store = MemoryBackend(max_entries)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    def peek(self, symbol: str):
+        """
+        (found, quote) from memory only; never fetches.
+        """
+        entry = self._store.get(symbol)
+        if entry is None:
+            return False, None
+        return True, _copy(entry[0])
+
+    def fetched_at(self, symbol: str):
+        """
+        Epoch seconds at which the cached entry for `symbol` came from upstream, or None.
+        """
+        entry = self._store.get(symbol)
+        return entry[1] if entry is not None else None
+
+    def put(self, symbol: str, quote):
+        # a tuple, so a cached None is distinguishable from a miss, carrying when it was fetched
+        self._store.set(symbol, (quote, time.time()), self.ttl if quote else self.miss_ttl)
+
+    def get(self, symbol: str, fetch):
+        found, quote = self.peek(symbol)
+        if found:
+            self.hits += 1
+            return quote
+
+        with self._lock:
+            # re-check under the lock: a flight may have landed since the peek
+            found, quote = self.peek(symbol)
+            if found:
+                self.hits += 1
+                return quote
+            self.misses += 1
+            flight = self._inflight.get(symbol)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[symbol] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            return _copy(flight.result)
+
+        try:
+            self.fetches += 1
+            flight.result = fetch(symbol)
+            self.put(symbol, flight.result)
+        finally:
+            with self._lock:
+                self._inflight.pop(symbol, None)
+            flight.done.set()
+        return _copy(flight.result)
+
+    def get_many(self, symbols, fetch_many):
+        """
+        {symbol: quote or None} for every symbol. Misses not already in flight are fetched
+        together with one fetch_many(list) -> {symbol: quote} call; the rest wait on their flights.
+        """
+        out, waiting, mine = {}, {}, {}
+        with self._lock:
+            for symbol in dict.fromkeys(symbols):
+                found, quote = self.peek(symbol)
+                if found:
+                    self.hits += 1
+                    out[symbol] = quote
+                    continue
+                self.misses += 1
+                flight = self._inflight.get(symbol)
+                if flight is not None:
+                    waiting[symbol] = flight
+                else:
+                    mine[symbol] = self._inflight[symbol] = _Flight()
+
+        if mine:
+            try:
+                self.fetches += 1
+                got = fetch_many(list(mine))
+                for symbol, flight in mine.items():
+                    flight.result = got.get(symbol)
+                    self.put(symbol, flight.result)
+                    out[symbol] = _copy(flight.result)
+            finally:
+                with self._lock:
+                    for symbol in mine:
+                        self._inflight.pop(symbol, None)
+                for flight in mine.values():
+                    flight.done.set()
+
+        for symbol, flight in waiting.items():
+            flight.done.wait()
+            out[symbol] = _copy(flight.result)
+        return out
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "upstream_fetches": self.fetches,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+quote_cache = QuoteCache()
+
+
+def init_quote_cache(app):
+    quote_cache.ttl = app.config.get("QUOTE_CACHE_TTL", 15)
+    quote_cache.miss_ttl = app.config.get("QUOTE_MISS_TTL", 5)
@@ -0,0 +1,41 @@
+def parse_fields(raw, allowed):
+    """
+    Parse a ?fields=a,b,c query arg against the serializer's field names.
+    Returns the requested names in `allowed` order, or all of them when absent.
+    """
+    if not raw:
+        return tuple(allowed)
+    wanted = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = wanted - set(allowed)
+    if unknown:
+        raise ValueError("unknown fields: " + ", ".join(sorted(unknown)))
+    return tuple(f for f in allowed if f in wanted)
+
+
+def mongo_projection(fields, always=(), stored=None):
+    """
+    Projection for the stored fields behind `fields` (`id` maps to `_id`, which Mongo returns anyway).
+    `stored` maps an output field to the document keys it is read from, when they differ.
+    """
+    stored = stored or {}
+    proj = {k: 1 for f in fields if f != "id" for k in stored.get(f, (f,))}
+    for f in always:
+        proj[f] = 1
+    # ✅ an empty projection would mean "whole document"; ?fields=id only needs the _id
+    return proj or {"_id": 1}
+
+
+def serialize(doc, serializers, fields):
+    return {f: serializers[f](doc) for f in fields}
+
+
+def wants_columnar(args):
+    return args.get("format") == "columnar"
+
+
+def to_columns(docs, serializers, fields):
+    """
+    {"id": [...], "amount": [...], ...} — one array per field instead of one object per row.
+    """
+    docs = list(docs)
+    return {f: [serializers[f](d) for d in docs] for f in fields}
@@ -0,0 +1,213 @@
+import csv
+import hashlib
+import io
+import re
+from datetime import datetime, timezone
+
+# --- Category rules: first match wins, so keep the more specific ones on top ---
+CATEGORY_RULES = [
+    ("Entertainment", r"netflix|spotify|bookmyshow|hotstar|prime ?video|pvr|inox"),
+    ("Groceries", r"bigbasket|blinkit|zepto|dmart|grocer|supermarket|reliance fresh|more retail"),
+    ("Food", r"swiggy|zomato|restaurant|cafe|dominos|mcdonald|starbucks|kfc|pizza|eatery"),
+    ("Travel", r"uber|\bola\b|rapido|irctc|makemytrip|goibibo|indigo|air ?india|vistara|metro|petrol|fuel|fastag|redbus"),
+    ("Shopping", r"amazon|flipkart|myntra|ajio|nykaa|meesho|croma"),
+    ("Rent", r"\brent\b|nobroker|house ?rent"),
+    ("Bills", r"electricity|bescom|tneb|msedcl|airtel|\bjio\b|vodafone|\bvi\b|broadband|recharge|\bbill\b|gas|water"),
+    ("Health", r"pharm|apollo|hospital|clinic|medplus|1mg|netmeds|diagnostic"),
+    ("Education", r"school|college|universit|udemy|coursera|tuition|byju"),
+    ("Investments", r"zerodha|groww|upstox|mutual ?fund|\bsip\b|\bnps\b"),
+    ("Savings", r"\bfd\b|\brd\b|fixed deposit|recurring deposit|\bppf\b"),
+]
+_COMPILED_RULES = [(cat, re.compile(pat, re.IGNORECASE)) for cat, pat in CATEGORY_RULES]
+
+_CSV_DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%m-%y",
+                     "%d %b %Y", "%d-%b-%Y", "%d %b %y", "%d-%b-%y", "%m/%d/%Y"]
+
+_CSV_COLUMNS = {
+    "date": ("date", "transaction date", "txn date", "value date", "posting date", "tran date"),
+    "description": ("description", "narration", "details", "particulars", "remarks", "transaction details"),
+    "amount": ("amount", "transaction amount", "amount (inr)"),
+    "debit": ("debit", "withdrawal", "withdrawal amt.", "withdrawal amount", "debit amount", "dr"),
+    "credit": ("credit", "deposit", "deposit amt.", "deposit amount", "credit amount", "cr"),
+    "ref": ("ref", "reference", "ref no.", "ref no./cheque no.", "chq./ref.no.", "transaction id", "utr"),
+}
+
+
+def categorize(description: str):
+    for cat, rx in _COMPILED_RULES:
+        if rx.search(description or ""):
+            return cat
+    return "Other"
+
+
+def _to_amount(val):
+    if val is None:
+        return None
+    s = str(val).replace(",", "").replace("₹", "").strip()
+    if not s:
+        return None
+    if s.startswith("(") and s.endswith(")"):  # accounting negative
+        s = "-" + s[1:-1]
+    return float(s)
+
+
+class _DateParser:
+    """Remembers the last format that worked; statements use one format throughout."""
+
+    def __init__(self):
+        self.last = None
+
+    def __call__(self, raw: str):
+        raw = (raw or "").strip()
+        if self.last:
+            try:
+                return datetime.strptime(raw, self.last).replace(tzinfo=timezone.utc)
+            except ValueError:
+                pass
+        for fmt in _CSV_DATE_FORMATS:
+            try:
+                dt = datetime.strptime(raw, fmt)
+            except ValueError:
+                continue
+            self.last = fmt
+            return dt.replace(tzinfo=timezone.utc)
+        raise ValueError(f"unrecognised date {raw!r}")
+
+
+def iter_csv_rows(stream):
+    """
+    Yield {date, amount, description, ref} from a CSV statement, one row at a time.
+    Negative amounts are money going out; debit/credit column pairs are folded into that sign.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if not header:
+        return
+    lowered = [h.strip().lower() for h in header]
+    cols = {}
+    for key, names in _CSV_COLUMNS.items():
+        for idx, h in enumerate(lowered):
+            if h in names:
+                cols[key] = idx
+                break
+    if "date" not in cols or not ({"amount", "debit", "credit"} & cols.keys()):
+        raise ValueError("CSV needs a date column and an amount or debit/credit column")
+
+    parse_date = _DateParser()
+
+    def cell(row, key):
+        idx = cols.get(key)
+        return row[idx] if idx is not None and idx < len(row) else None
+
+    for line_no, row in enumerate(reader, start=2):
+        if not row or not any(c.strip() for c in row):
+            continue
+        try:
+            if "amount" in cols:
+                amount = _to_amount(cell(row, "amount"))
+            else:
+                debit = _to_amount(cell(row, "debit"))
+                credit = _to_amount(cell(row, "credit"))
+                amount = -abs(debit) if debit else (abs(credit) if credit else None)
+            if amount is None:
+                raise ValueError("missing amount")
+            yield {
+                "line": line_no,
+                "date": parse_date(cell(row, "date")),
+                "amount": amount,
+                "description": (cell(row, "description") or "").strip(),
+                "ref": (cell(row, "ref") or "").strip() or None,
+            }
+        except ValueError as e:
+            yield {"line": line_no, "error": str(e)}
+
+
+def _parse_ofx_date(raw: str):
+    # YYYYMMDD[HHMMSS[.XXX]][[+-]TZ[:NAME]] — the posting day is all we keep
+    return datetime.strptime(raw.strip()[:8], "%Y%m%d").replace(tzinfo=timezone.utc)
+
+
+def _iter_ofx_tags(stream, chunk_size: int = 64 * 1024):
+    """
+    Tokenise OFX (SGML or XML flavour) into (tag, value) pairs, reading in chunks.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+    buf = ""
+    while True:
+        chunk = text.read(chunk_size)
+        buf += chunk
+        parts = buf.split("<")
+        buf = parts.pop() if chunk else ""
+        for part in parts:
+            if ">" not in part:
+                continue
+            tag, _, value = part.partition(">")
+            yield tag.strip().upper(), value.strip()
+        if not chunk:
+            break
+
+
+def iter_ofx_rows(stream):
+    """
+    Yield {date, amount, description, ref} for each <STMTTRN> in an OFX/QFX statement.
+    """
+    txn = None
+    n = 0
+    for tag, value in _iter_ofx_tags(stream):
+        if tag == "STMTTRN":
+            txn = {}
+        elif tag == "/STMTTRN" and txn is not None:
+            n += 1
+            try:
+                amount = _to_amount(txn.get("TRNAMT"))
+                if amount is None:
+                    raise ValueError("missing amount")
+                yield {
+                    "line": n,
+                    "date": _parse_ofx_date(txn.get("DTPOSTED", "")),
+                    "amount": amount,
+                    "description": (txn.get("NAME") or txn.get("MEMO") or "").strip(),
+                    "ref": txn.get("FITID") or None,
+                }
+            except (ValueError, TypeError) as e:
+                yield {"line": n, "error": str(e)}
+            txn = None
+        elif txn is not None and not tag.startswith("/") and value:
+            txn[tag] = value
+
+
+def detect_format(filename: str, explicit: str = None):
+    fmt = (explicit or "").lower()
+    if not fmt:
+        name = (filename or "").lower()
+        fmt = "ofx" if name.endswith((".ofx", ".qfx")) else "csv"
+    if fmt not in {"csv", "ofx"}:
+        raise ValueError("format must be csv or ofx")
+    return fmt
+
+
+class ContentHasher:
+    """
+    Stable per-row hash used to skip rows that were already imported.
+    Rows with a bank reference hash on it; otherwise identical same-day rows are
+    told apart by their position in the run of identical rows for that day.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = str(user_id)
+        self._day = None
+        self._seen = {}
+
+    def __call__(self, row: dict):
+        if row.get("ref"):
+            key = f"ref|{row['ref']}|{row['date'].date().isoformat()}|{row['amount']:.2f}"
+        else:
+            day = row["date"].date()
+            if day != self._day:  # statements are date-ordered; keep only one day of state
+                self._day, self._seen = day, {}
+            base = f"{day.isoformat()}|{row['amount']:.2f}|{' '.join(row['description'].lower().split())}"
+            n = self._seen.get(base, 0)
+            self._seen[base] = n + 1
+            key = f"{base}|{n}"
+        return hashlib.sha1(f"{self.user_id}|{key}".encode("utf-8")).hexdigest()
@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from flask import abort
 
 ALLOWED_CATEGORIES = {
@@ -5,9 +6,18 @@ ALLOWED_CATEGORIES = {
     "Health","Groceries","Education","Other","Income","Investments","Savings"
 }
 
-def validate_category(cat: str):
-    if not cat or cat not in ALLOWED_CATEGORIES:
-        raise ValueError("invalid category")
+def validate_category(cat: str, user_id: str = None):
+    """
+    Built-in categories are checked in memory; with a user_id, that user's custom
+    categories are accepted too (served from a per-process cache).
+    """
+    if cat and cat in ALLOWED_CATEGORIES:
+        return
+    if cat and user_id:
+        from models.category_model import is_user_category
+        if is_user_category(user_id, cat):
+            return
+    raise ValueError("invalid category")
 
 def validate_amount(val):
     try:
@@ -19,5 +29,16 @@ def validate_amount(val):
         raise ValueError("invalid amount")
 
 
-
-        
+def parse_utc(dt_str: str):
+    """
+    Parse an ISO date/datetime string to an aware UTC datetime (naive input is taken as UTC).
+    None/empty gives None; malformed input raises ValueError.
+    """
+    if not dt_str:
+        return None
+    dt = datetime.fromisoformat(dt_str)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    else:
+        dt = dt.astimezone(timezone.utc)
+    return dt